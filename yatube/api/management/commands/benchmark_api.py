@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+
+def pages(post):
+    """Пары (HTML-страница, ответ API) для страниц поста post."""
+    pairs = [
+        ('index', reverse('posts:index'), reverse('api:v1:index')),
+        (
+            'profile',
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('api:v1:profile', args=[post.author.username]),
+        ),
+        (
+            'post_detail',
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('api:v1:post_detail', args=[post.pk]),
+        ),
+    ]
+    if post.group:
+        pairs.insert(1, (
+            'group_list',
+            reverse('posts:group_list', args=[post.group.slug]),
+            reverse('api:v1:group_list', args=[post.group.slug]),
+        ))
+    return pairs
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа, размер и число SQL-запросов '
+        'HTML-страниц и соответствующих ответов API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Не сбрасывать кеш перед запросами: мерить попадания.'
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False
+        ).first() or Post.objects.select_related('author').first()
+        if post is None:
+            raise CommandError('Нет постов: сравнивать нечего.')
+        # Адрес не из INTERNAL_IPS: debug_toolbar не собирает данные
+        # о запросах и не искажает замеры.
+        client = Client(REMOTE_ADDR='192.0.2.1')
+        for name, html_url, api_url in pages(post):
+            html = self.measure(client, html_url, options)
+            api = self.measure(client, api_url, options)
+            self.stdout.write(
+                f'{name}: HTML {self.format(html)}; API {self.format(api)}; '
+                f'API быстрее в {html[0] / api[0]:.1f} раза'
+            )
+
+    def measure(self, client, url, options):
+        """Медианное время ответа в мс, размер в байтах и число запросов."""
+        timings = []
+        for _ in range(options['requests']):
+            if not options['warm']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+        return (
+            statistics.median(timings),
+            len(response.content),
+            len(queries),
+        )
+
+    @staticmethod
+    def format(result):
+        elapsed, size, queries = result
+        return f'{elapsed:.2f} мс, {size / 1024:.1f} КБ, {queries} запр.'
@@ -0,0 +1,126 @@
+from operator import itemgetter
+
+from django.core.files.storage import default_storage
+
+from posts.utils import CursorPaginator
+
+
+class InvalidFields(Exception):
+    pass
+
+
+def _datetime(value):
+    return value.isoformat()
+
+
+def full_name(first_name, last_name):
+    return f'{first_name} {last_name}'.strip()
+
+
+def _image(name, width, height):
+    if not name:
+        return None
+    return {
+        'url': default_storage.url(name),
+        'width': width,
+        'height': height,
+    }
+
+
+class Field:
+    """Поле ответа из одной или нескольких колонок values_list."""
+
+    def __init__(self, *columns, convert=None):
+        self.columns = columns
+        self.convert = convert
+
+
+POST_FIELDS = {
+    'id': Field('id'),
+    'text': Field('text'),
+    'pub_date': Field('pub_date', convert=_datetime),
+    'author': Field('author__username'),
+    'author_name': Field(
+        'author__first_name', 'author__last_name', convert=full_name
+    ),
+    'group': Field('group__slug'),
+    'image': Field('image', 'image_width', 'image_height', convert=_image),
+    'comments_count': Field('comments_count'),
+}
+
+COMMENT_FIELDS = {
+    'id': Field('id'),
+    'text': Field('text'),
+    'created': Field('created', convert=_datetime),
+    'author': Field('author__username'),
+}
+
+
+class RowSerializer:
+    """Превращает строки values_list в словари ответа.
+
+    Колонки выбираются только для запрошенных полей, а для каждого
+    поля заранее вычисляются позиции его колонок в строке, поэтому
+    на строку приходится один проход по полям без моделей
+    и без поиска по именам.
+    """
+
+    def __init__(self, fields, names=None, key_columns=()):
+        names = list(fields) if names is None else names
+        unknown = [name for name in names if name not in fields]
+        if unknown:
+            raise InvalidFields(unknown)
+        self.columns = list(key_columns)
+        for name in names:
+            for column in fields[name].columns:
+                if column not in self.columns:
+                    self.columns.append(column)
+        position = {column: i for i, column in enumerate(self.columns)}
+        self.getters = []
+        for name in dict.fromkeys(names):
+            field = fields[name]
+            get = itemgetter(*(position[c] for c in field.columns))
+            if field.convert is None:
+                self.getters.append((name, get))
+            elif len(field.columns) == 1:
+                self.getters.append(
+                    (name, lambda row, get=get, f=field.convert: f(get(row)))
+                )
+            else:
+                self.getters.append(
+                    (name, lambda row, get=get, f=field.convert: f(*get(row)))
+                )
+        self.position = position
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def serialize(self, row):
+        return {name: get(row) for name, get in self.getters}
+
+    def serialize_many(self, rows):
+        return [self.serialize(row) for row in rows]
+
+
+class RowPaginator(CursorPaginator):
+    """CursorPaginator по строкам values_list: значения курсора
+    берутся из колонок строки по их позициям.
+    """
+
+    def __init__(self, queryset, per_page, serializer):
+        super().__init__(serializer.rows(queryset), per_page)
+        self.serializer = serializer
+
+    def key_value(self, obj, name):
+        column = self._attname(name)
+        return obj[self.serializer.position[column]]
+
+
+def parse_fields(value):
+    """Список полей из параметра ?fields=a,b или None, если он не задан."""
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if not names:
+        raise InvalidFields(names)
+    return names
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import assert_query_budget
+from posts.models import Comment, Group, Post
+
+from .serializers import POST_FIELDS, RowSerializer
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Литература', slug='books', description='Книги'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(3)
+        ]
+        cls.first_page = [cls.posts[2].pk, cls.posts[1].pk]
+        cls.comment = Comment.objects.create(
+            author=cls.author, post=cls.posts[0], text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def ids(self, data):
+        return [post['id'] for post in data['results']]
+
+    def test_feed_pages(self):
+        """Лента листается по курсору, ссылки сохраняют параметры"""
+        data = self.client.get(
+            reverse('api:v1:index'), {'fields': 'id'}
+        ).json()
+        self.assertEqual(self.ids(data), self.first_page)
+        self.assertIsNone(data['previous'])
+        self.assertIn('fields=id', data['next'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(self.ids(data), [self.posts[0].pk])
+        self.assertIsNone(data['next'])
+        data = self.client.get(data['previous']).json()
+        self.assertEqual(self.ids(data), self.first_page)
+
+    def test_post_fields(self):
+        """Пост отдаётся со всеми полями, ?fields оставляет нужные"""
+        post = self.posts[0]
+        url = reverse('api:v1:post_detail', args=[post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(data['post'], {
+            'id': post.pk,
+            'text': 'Пост 0',
+            'pub_date': post.pub_date.isoformat(),
+            'author': 'leo',
+            'author_name': 'Лев Толстой',
+            'group': 'books',
+            'image': None,
+            'comments_count': 1,
+        })
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий']
+        )
+        data = self.client.get(url, {'fields': 'text,author'}).json()
+        self.assertEqual(data['post'], {'text': 'Пост 0', 'author': 'leo'})
+
+    def test_unknown_field(self):
+        """Неизвестное поле — ошибка 400"""
+        response = self.client.get(
+            reverse('api:v1:index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_group_and_profile(self):
+        """Группа и профиль отдаются вместе с первой страницей постов"""
+        data = self.client.get(
+            reverse('api:v1:group_list', args=['books'])
+        ).json()
+        self.assertEqual(data['group']['title'], 'Литература')
+        self.assertEqual(self.ids(data), self.first_page)
+        data = self.client.get(
+            reverse('api:v1:profile', args=['leo'])
+        ).json()
+        self.assertEqual(data['author']['name'], 'Лев Толстой')
+        self.assertEqual(data['author']['posts_count'], 3)
+        self.assertEqual(self.ids(data), self.first_page)
+
+    def test_not_found(self):
+        """Несуществующие объекты — JSON с ошибкой 404"""
+        for url in (
+            reverse('api:v1:group_list', args=['missing']),
+            reverse('api:v1:profile', args=['missing']),
+            reverse('api:v1:post_detail', args=[999]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', response.json())
+                self.assertFalse(response.has_header('ETag'))
+
+    def test_etag(self):
+        """Неизменившийся ответ — 304, после изменения поста — 200"""
+        url = reverse('api:v1:post_detail', args=[self.posts[0].pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            author=self.author, post=self.posts[0], text='Ещё один'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['post']['comments_count'], 2)
+
+    def test_read_only(self):
+        """API только для чтения"""
+        response = self.client.post(reverse('api:v1:index'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_serializer_selects_needed_columns(self):
+        """Из базы читаются только колонки запрошенных полей и ключа"""
+        serializer = RowSerializer(
+            POST_FIELDS, ['author_name'], key_columns=('pub_date', 'id')
+        )
+        self.assertEqual(serializer.columns, [
+            'pub_date', 'id', 'author__first_name', 'author__last_name'
+        ])
+
+    def test_query_budgets(self):
+        """Ответы API укладываются в свои бюджеты запросов"""
+        self.client.force_login(self.author)
+        post = self.posts[0]
+        for url_name, args in (
+            ('api:v1:index', []),
+            ('api:v1:group_list', ['books']),
+            ('api:v1:profile', ['leo']),
+            ('api:v1:post_detail', [post.pk]),
+        ):
+            with self.subTest(url_name=url_name):
+                with assert_query_budget(url_name):
+                    self.client.get(reverse(url_name, args=args))
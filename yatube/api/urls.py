@@ -0,0 +1,18 @@
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+# Новая несовместимая версия API получает свой префикс и свои views,
+# а клиенты старой продолжают работать.
+v1_patterns = [
+    path('posts/', views.index, name='index'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('groups/<slug:slug>/', views.group_posts, name='group_list'),
+    path('profiles/<str:username>/', views.profile, name='profile'),
+]
+
+urlpatterns = [
+    path('v1/', include((v1_patterns, 'v1'))),
+]
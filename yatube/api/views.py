@@ -0,0 +1,153 @@
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.page_cache import cache_page_for_anonymous, conditional_page
+from posts.caching import (
+    group_page_tags,
+    index_page_tags,
+    post_page_tags,
+    profile_page_tags,
+)
+from posts.models import Comment, Group, Post
+
+from .serializers import (
+    COMMENT_FIELDS,
+    POST_FIELDS,
+    InvalidFields,
+    RowPaginator,
+    RowSerializer,
+    full_name,
+    parse_fields,
+)
+
+User = get_user_model()
+
+# Колонки ключа сортировки лент (-pub_date, -pk) для курсора.
+FEED_KEY_COLUMNS = ('pub_date', 'id')
+
+
+def api_view(get_tags):
+    """Ответ API с теми же ETag и кешем для анонимов, что у HTML-страницы
+    с тегами get_tags: JSON устаревает вместе с ней.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except InvalidFields as error:
+                return error_response(
+                    f'Неизвестные поля: {", ".join(error.args[0])}', 400
+                )
+        cached = cache_page_for_anonymous(get_tags)(wrapper)
+        return require_GET(conditional_page(get_tags)(cached))
+    return decorator
+
+
+def error_response(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def not_found():
+    return error_response('Не найдено', 404)
+
+
+def post_serializer(request):
+    return RowSerializer(
+        POST_FIELDS,
+        parse_fields(request.GET.get('fields')),
+        key_columns=FEED_KEY_COLUMNS
+    )
+
+
+def page_url(request, cursor_name, cursor):
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[cursor_name] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def feed(request, posts):
+    """Страница ленты: посты и ссылки на соседние страницы."""
+    serializer = post_serializer(request)
+    paginator = RowPaginator(posts, settings.POSTS_PER_PAGE, serializer)
+    page = paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return {
+        'results': serializer.serialize_many(page),
+        'next': page.next_cursor and page_url(
+            request, 'after', page.next_cursor
+        ),
+        'previous': page.previous_cursor and page_url(
+            request, 'before', page.previous_cursor
+        ),
+    }
+
+
+@api_view(index_page_tags)
+def index(request):
+    return JsonResponse(feed(request, Post.objects.all()))
+
+
+@api_view(group_page_tags)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'slug', 'title', 'description'
+    ).first()
+    if group is None:
+        return not_found()
+    posts = Post.objects.filter(group_id=group.pop('id'))
+    return JsonResponse({'group': group, **feed(request, posts)})
+
+
+@api_view(profile_page_tags)
+def profile(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'id',
+        'username',
+        'first_name',
+        'last_name',
+        'counters__posts_count',
+        'counters__followers_count',
+        'counters__following_count',
+    ).first()
+    if author is None:
+        return not_found()
+    (
+        author_id, username, first_name, last_name,
+        posts_count, followers_count, following_count,
+    ) = author
+    data = {
+        'author': {
+            'username': username,
+            'name': full_name(first_name, last_name),
+            'posts_count': posts_count or 0,
+            'followers_count': followers_count or 0,
+            'following_count': following_count or 0,
+        },
+        **feed(request, Post.objects.filter(author_id=author_id)),
+    }
+    return JsonResponse(data)
+
+
+@api_view(post_page_tags)
+def post_detail(request, post_id):
+    serializer = post_serializer(request)
+    row = serializer.rows(Post.objects.filter(pk=post_id)).first()
+    if row is None:
+        return not_found()
+    comments = RowSerializer(COMMENT_FIELDS)
+    comment_rows = comments.rows(
+        Comment.objects.filter(post_id=post_id).order_by('-created', '-id')
+    )
+    return JsonResponse({
+        'post': serializer.serialize(row),
+        'comments': comments.serialize_many(comment_rows),
+    })
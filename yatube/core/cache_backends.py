@@ -0,0 +1,189 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: небольшой LRU в памяти процесса (L1)
+    перед общим для всех процессов кешем (L2).
+
+    OPTIONS:
+        L2 — псевдоним общего кеша в CACHES;
+        L1_MAX_BYTES — предельный размер L1 (считается по pickle);
+        L1_TIMEOUT — сколько секунд L1 доверяет своей копии.
+
+    Запись идёт в L2 и в L1 текущего процесса, а L1 остальных
+    процессов узнают о ней не позже чем через L1_TIMEOUT,
+    поэтому этот срок должен быть коротким.
+    Счётчики (incr/decr) хранятся только в L2.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._max_bytes = options.get('L1_MAX_BYTES', 1024 * 1024)
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._l1 = OrderedDict()
+        self._l1_bytes = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    def stats(self):
+        """Попадания и промахи по уровням с момента reset_stats."""
+        with self._lock:
+            return {
+                'l1': dict(self._stats['l1']),
+                'l2': dict(self._stats['l2']),
+                'l1_keys': len(self._l1),
+                'l1_bytes': self._l1_bytes,
+            }
+
+    def reset_stats(self):
+        self._stats = {
+            'l1': {'hits': 0, 'misses': 0},
+            'l2': {'hits': 0, 'misses': 0},
+        }
+
+    def _count(self, tier, hits, misses):
+        with self._lock:
+            self._stats[tier]['hits'] += hits
+            self._stats[tier]['misses'] += misses
+
+    def _l1_key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires <= time.monotonic():
+                self._l1_pop(key)
+                return _MISSING
+            self._l1.move_to_end(key)
+        return pickle.loads(data)
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self._l1_timeout_for(timeout)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1_pop(key)
+            if timeout <= 0 or len(data) > self._max_bytes:
+                return
+            self._l1[key] = (time.monotonic() + timeout, data)
+            self._l1_bytes += len(data)
+            while self._l1_bytes > self._max_bytes:
+                _, (_, evicted) = self._l1.popitem(last=False)
+                self._l1_bytes -= len(evicted)
+
+    def _l1_pop(self, key):
+        # Вызывается под self._lock.
+        entry = self._l1.pop(key, None)
+        if entry is not None:
+            self._l1_bytes -= len(entry[1])
+
+    def _l1_delete(self, key):
+        with self._lock:
+            self._l1_pop(key)
+
+    def _l1_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self._l1_key(key, version)
+        value = self._l1_get(l1_key)
+        if value is not _MISSING:
+            self._count('l1', 1, 0)
+            return value
+        self._count('l1', 0, 1)
+        value = self._l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count('l2', 0, 1)
+            return default
+        self._count('l2', 1, 0)
+        self._l1_set(l1_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._l1_get(self._l1_key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._count('l1', len(found), len(missing))
+        if missing:
+            fetched = self._l2.get_many(missing, version=version)
+            self._count('l2', len(fetched), len(missing) - len(fetched))
+            for key, value in fetched.items():
+                self._l1_set(self._l1_key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2.set(key, value, timeout, version=version)
+        self._l1_set(self._l1_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2.set_many(data, timeout, version=version) or []
+        for key, value in data.items():
+            l1_key = self._l1_key(key, version)
+            if key in failed:
+                self._l1_delete(l1_key)
+            else:
+                self._l1_set(l1_key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self._l2.add(key, value, timeout, version=version):
+            return False
+        self._l1_set(self._l1_key(key, version), value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self._l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self._l2.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self._l1_key(key, version)) is not _MISSING:
+            return True
+        return self._l2.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        self._l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1_delete(self._l1_key(key, version))
+        self._l2.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+            self._l1_bytes = 0
+        self._l2.clear()
@@ -0,0 +1,32 @@
+import uuid
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'cache-tag:'
+
+
+def get_versions(tags):
+    """Текущие версии тегов в порядке tags.
+
+    Закешированное значение хранится под ключом, включающим версии
+    своих тегов, поэтому смена версии (purge) точно отсекает
+    только зависящие от тега записи. Версия — случайная метка,
+    а не счётчик: если её вытеснят из кеша, новая не совпадёт
+    ни с одной из старых и не откроет доступ к устаревшим записям.
+    """
+    keys = [KEY_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, '') for key in keys]
+
+
+def purge(tags):
+    """Сбросить все записи, помеченные любым из тегов."""
+    cache.set_many(
+        {KEY_PREFIX + tag: uuid.uuid4().hex for tag in tags},
+        timeout=None
+    )
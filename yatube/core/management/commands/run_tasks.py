@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+def _execute_in_thread(task):
+    try:
+        tasks.execute(task)
+    finally:
+        # Соединения с базой у потока свои, закрываем их сами.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди core.tasks в нескольких потоках.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Число потоков (по умолчанию TASKS_WORKERS); 0 — в текущем.'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=1.0,
+            help='Через сколько секунд снова проверять пустую очередь.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers is None:
+            workers = settings.TASKS_WORKERS
+        if workers == 0:
+            executed = self.run(map, tasks.execute, 1, options)
+        else:
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='tasks'
+            ) as executor:
+                executed = self.run(
+                    executor.map, _execute_in_thread, workers, options
+                )
+        self.stdout.write(f'Выполнено задач: {executed}')
+
+    def run(self, map_, execute, batch_size, options):
+        executed = 0
+        purged_at = 0
+        while True:
+            if time.monotonic() - purged_at > 60:
+                tasks.purge_finished()
+                purged_at = time.monotonic()
+            claimed = tasks.claim(batch_size)
+            if claimed:
+                # Ждём всю пачку: следующая займёт освободившиеся потоки.
+                list(map_(execute, claimed))
+                executed += len(claimed)
+                continue
+            if options['once']:
+                return executed
+            time.sleep(options['poll'])
@@ -0,0 +1,21 @@
+from django.core.cache import cache
+
+KEY_PREFIX = 'metrics:'
+
+
+def incr(name, delta=1):
+    """Увеличить счётчик name, общий для всех процессов с этим кешем."""
+    if not delta:
+        return
+    key = KEY_PREFIX + name
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Ключ вытеснили из кеша между add и incr.
+        cache.set(key, delta, timeout=None)
+
+
+def get_counters(names):
+    values = cache.get_many([KEY_PREFIX + name for name in names])
+    return {name: values.get(KEY_PREFIX + name, 0) for name in names}
@@ -0,0 +1,35 @@
+import logging
+
+from django.conf import settings
+
+from .queries import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCountMiddleware:
+    """Считает SQL-запросы каждого запроса и пишет в лог нарушителей:
+    страницы сверх бюджета из QUERY_BUDGETS и повторы одного запроса (N+1).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with counter.installed():
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                '%s: %d SQL-запросов при бюджете %d',
+                view_name, counter.count, budget
+            )
+        for sql, count in counter.repeated(settings.QUERY_REPEAT_THRESHOLD):
+            logger.warning(
+                '%s: возможно N+1, запрос выполнен %d раз: %s',
+                view_name, count, sql
+            )
+        return response
@@ -0,0 +1,85 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from .cache_tags import get_versions
+
+KEY_PREFIX = 'page:'
+
+
+def cache_page_for_anonymous(get_tags):
+    """Кешировать страницу целиком для анонимных посетителей.
+
+    get_tags(**kwargs) по аргументам URL возвращает теги страницы
+    без обращения к базе. Версии тегов входят в ключ, поэтому
+    purge любого тега сразу сбрасывает все страницы с ним,
+    а таймаут лишь освобождает место от неиспользуемых записей.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            # Версии читаются до выполнения view: запись, случившаяся
+            # во время рендеринга, сменит версию и не даст закешировать
+            # устаревшую страницу под новым ключом.
+            versions = get_versions(get_tags(**kwargs))
+            key = KEY_PREFIX + hashlib.md5(
+                '\n'.join([request.get_full_path(), *versions]).encode()
+            ).hexdigest()
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def tags_etag(get_tags):
+    """Функция ETag для condition: страница не меняется, пока не сменились
+    версии её тегов, сессия посетителя и интервал PAGE_CACHE_TIMEOUT.
+
+    Сессия нужна, потому что авторизованные посетители видят свою
+    навигацию и CSRF-токен; интервал ограничивает устаревание того,
+    что тегами не отслеживается, так же, как таймаут кеша страниц.
+    """
+    def etag(request, *args, **kwargs):
+        parts = [
+            request.get_full_path(),
+            request.session.session_key or '',
+            str(int(time.time() // settings.PAGE_CACHE_TIMEOUT)),
+            *get_versions(get_tags(**kwargs)),
+        ]
+        return hashlib.md5('\n'.join(parts).encode()).hexdigest()
+    return etag
+
+
+def conditional_page(get_tags):
+    """Отвечать 304 Not Modified без выполнения view,
+    если ETag из If-None-Match совпадает с текущим.
+
+    Cache-Control: no-cache заставляет браузер и прокси
+    сверяться с сервером перед каждым показом страницы,
+    а Vary: Cookie не даёт прокси путать ответы разным посетителям.
+    ETag получают только ответы 200: версии тегов не меняются,
+    когда отсутствующий объект появляется, и 304 закрепил бы ошибку.
+    """
+    def decorator(view):
+        conditional = condition(etag_func=tags_etag(get_tags))(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                del response['ETag']
+            return response
+        return vary_on_cookie(cache_control(no_cache=True)(wrapper))
+    return decorator
@@ -0,0 +1,57 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+LOCK_PREFIX = 'lock:'
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, lock_timeout=10,
+                   wait=5.0, poll=0.05):
+    """Значение из кеша или compute(), пересчитанное одним запросом.
+
+    Запись хранится вдвое дольше timeout: после логического истечения
+    её ещё можно отдать, пока один запрос держит блокировку и
+    пересчитывает значение. Остальные получают устаревшее значение,
+    а если его нет — ждут до wait секунд появления нового.
+
+    Чтобы истечение не совпадало у всех запросов, значение обновляется
+    заранее с вероятностью, растущей к концу срока и пропорциональной
+    времени вычисления (XFetch, коэффициент beta).
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        value, expires, delta = entry
+        if now - delta * beta * math.log(1 - random.random()) < expires:
+            return value
+    lock_key = LOCK_PREFIX + key
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            return _compute_and_store(key, compute, timeout)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        return entry[0]
+    deadline = now + wait
+    while time.time() < deadline:
+        time.sleep(poll)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    # Держатель блокировки не успел: считаем сами, но не сохраняем,
+    # чтобы не затереть его результат.
+    return compute()
+
+
+def _compute_and_store(key, compute, timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    if timeout is None:
+        expires, stored_timeout = math.inf, None
+    else:
+        expires, stored_timeout = finished + timeout, timeout * 2
+    cache.set(key, (value, expires, finished - started), stored_timeout)
+    return value
@@ -0,0 +1,49 @@
+import os
+import posixpath
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class ShardedFileSystemStorage(FileSystemStorage):
+    """Раскладывает загружаемые файлы по случайным подкаталогам:
+    posts/photo.jpg → posts/3f/a2/photo.jpg.
+
+    Глубина задаётся MEDIA_SHARD_DEPTH; при двух уровнях каталог
+    делится на 65536 частей. Имя файла сохраняется как есть.
+    Сдвигается только путь, который строит FileField.generate_filename,
+    поэтому файлы, сохраняемые напрямую (миниатюры sorl), не затронуты.
+    """
+
+    def generate_filename(self, filename):
+        return self._sharded(filename, self.shards())
+
+    def content_filename(self, filename, digest):
+        """Путь по хешу содержимого: posts/photo.jpg → posts/9b/71/photo.jpg,
+        где 9b71… — digest. Одинаковые файлы попадают в один каталог.
+        """
+        return self._sharded(filename, self.shards(digest))
+
+    def _sharded(self, filename, shards):
+        dirname, basename = posixpath.split(filename.replace(os.sep, '/'))
+        return super().generate_filename(
+            posixpath.join(dirname, *shards, basename)
+        )
+
+    @staticmethod
+    def shards(token=None):
+        token = token or uuid.uuid4().hex
+        return [
+            token[level * 2:level * 2 + 2]
+            for level in range(settings.MEDIA_SHARD_DEPTH)
+        ]
+
+    @staticmethod
+    def is_sharded(name, upload_to):
+        """Лежит ли файл name уже в подкаталогах внутри upload_to."""
+        nested = posixpath.relpath(
+            posixpath.dirname(name), upload_to.rstrip('/')
+        )
+        depth = 0 if nested == '.' else nested.count('/') + 1
+        return depth >= settings.MEDIA_SHARD_DEPTH
@@ -0,0 +1,200 @@
+import datetime
+import json
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def task(max_attempts=None):
+    """Разрешить ставить функцию в очередь:
+
+        @task(max_attempts=3)
+        def send_digest(user_id):
+            ...
+
+        enqueue(send_digest, user.pk, key=f'digest:{user.pk}')
+
+    Аргументы задачи сохраняются в JSON, а функция ищется по пути
+    модуля при выполнении, поэтому она должна быть на уровне модуля.
+    """
+    def decorator(func):
+        func.max_attempts = max_attempts or settings.TASKS_MAX_ATTEMPTS
+        return func
+    return decorator
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, key=None):
+    """Поставить задачу в очередь в текущей транзакции.
+
+    Задача появится в очереди, только если транзакция зафиксируется.
+    Пока в очереди есть задача с тем же key (в том числе выполненная,
+    TASKS_RETENTION секунд), повторная постановка ничего не делает.
+    Неудачная задача с тем же key или выполненная больше
+    TASKS_RETENTION секунд назад, но ещё не удалённая, ставится заново.
+    """
+    if not hasattr(func, 'max_attempts'):
+        raise TypeError(f'{task_name(func)} не объявлена через @task')
+    if settings.TASKS_EAGER:
+        # Аргументы проходят через JSON так же, как из очереди.
+        _call(task_name(func), func, json.loads(json.dumps(args)))
+        return
+    now = timezone.now()
+    fields = {
+        'name': task_name(func),
+        'args': json.dumps(args),
+        'max_attempts': func.max_attempts,
+        'run_at': now,
+    }
+    # Строка с тем же ключом уже есть — конфликт просто пропускается.
+    Task.objects.bulk_create([Task(key=key, **fields)], ignore_conflicts=True)
+    if key is not None:
+        Task.objects.filter(
+            Q(status=Task.FAILED) | Q(status=Task.DONE, finished__lt=(
+                now - datetime.timedelta(seconds=settings.TASKS_RETENTION)
+            )),
+            key=key,
+        ).update(
+            status=Task.PENDING,
+            attempts=0,
+            locked_until=None,
+            last_error='',
+            finished=None,
+            **fields
+        )
+    if settings.TASKS_IN_PROCESS:
+        transaction.on_commit(_submit)
+
+
+def _due(now):
+    # Задачи, взятые упавшим исполнителем, освобождаются по locked_until.
+    return (
+        Q(status=Task.PENDING, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(limit):
+    """Занять до limit готовых к выполнению задач.
+
+    Задача занимается условным UPDATE, поэтому несколько исполнителей
+    не возьмут одну и ту же.
+    """
+    now = timezone.now()
+    due = list(
+        Task.objects.filter(_due(now)).order_by(
+            'run_at'
+        ).values_list('pk', flat=True)[:limit]
+    )
+    claimed = [
+        pk for pk in due
+        if Task.objects.filter(_due(now), pk=pk).update(
+            status=Task.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + datetime.timedelta(
+                seconds=settings.TASKS_LOCK_TIMEOUT
+            ),
+        )
+    ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def retry_delay(attempts):
+    return min(
+        settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASKS_MAX_RETRY_DELAY
+    )
+
+
+def execute(task_):
+    """Выполнить занятую задачу и записать результат.
+
+    Упавшая задача повторяется с экспоненциальной задержкой,
+    пока не исчерпает max_attempts.
+    """
+    now = timezone.now()
+    try:
+        func = import_string(task_.name)
+        func(*json.loads(task_.args))
+    except Exception:
+        logger.exception('Задача %s (%s) упала', task_.pk, task_.name)
+        if task_.attempts >= task_.max_attempts:
+            changes = {'status': Task.FAILED, 'finished': now}
+        else:
+            changes = {
+                'status': Task.PENDING,
+                'run_at': now + datetime.timedelta(
+                    seconds=retry_delay(task_.attempts)
+                ),
+            }
+        changes['last_error'] = traceback.format_exc()
+    else:
+        changes = {'status': Task.DONE, 'finished': now}
+    Task.objects.filter(pk=task_.pk).update(locked_until=None, **changes)
+
+
+def run_due(limit=None):
+    """Выполнить готовые задачи в текущем потоке; возвращает их число."""
+    tasks = claim(limit or settings.TASKS_WORKERS)
+    for task_ in tasks:
+        execute(task_)
+    return len(tasks)
+
+
+def purge_finished():
+    """Удалить выполненные задачи старше TASKS_RETENTION."""
+    cutoff = timezone.now() - datetime.timedelta(
+        seconds=settings.TASKS_RETENTION
+    )
+    return Task.objects.filter(
+        status=Task.DONE, finished__lt=cutoff
+    ).delete()[0]
+
+
+def _call(name, func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Задача %s упала', name)
+
+
+def _submit():
+    if settings.TASKS_THREADED:
+        _get_executor().submit(_run_in_thread)
+    else:
+        run_due()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TASKS_WORKERS,
+            thread_name_prefix='tasks'
+        )
+    return _executor
+
+
+def _run_in_thread():
+    try:
+        run_due()
+    except Exception:
+        logger.exception('Не удалось выполнить задачи')
+    finally:
+        # Соединения с базой у потока свои, закрываем их сами.
+        connections.close_all()
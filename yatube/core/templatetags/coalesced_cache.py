@@ -0,0 +1,69 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.single_flight import get_or_compute
+
+register = template.Library()
+
+KEY_PREFIX = 'coalesced.'
+
+
+class CoalescedCacheNode(template.Node):
+
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"coalesced_cache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}'
+            )
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"coalesced_cache" tag got a non-integer timeout '
+                    f'value: {expire_time!r}'
+                )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = KEY_PREFIX + make_template_fragment_key(
+            self.fragment_name, vary_on
+        )
+        return get_or_compute(
+            key,
+            lambda: self.nodelist.render(context),
+            expire_time
+        )
+
+
+@register.tag('coalesced_cache')
+def do_coalesced_cache(parser, token):
+    """Замена {% cache %} с теми же аргументами: при промахе фрагмент
+    рендерит один запрос, а остальные ждут его или получают
+    устаревшую копию (см. core.single_flight.get_or_compute).
+
+        {% load coalesced_cache %}
+        {% coalesced_cache 500 sidebar request.user.username %}
+            .. sidebar ..
+        {% endcoalesced_cache %}
+    """
+    nodelist = parser.parse(('endcoalesced_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments."
+        )
+    return CoalescedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+
+from .queries import QueryCounter
+
+
+@contextmanager
+def assert_query_budget(url_name, budget=None):
+    """Проверить, что код внутри with уложился в бюджет запросов страницы.
+
+    По умолчанию бюджет берётся из settings.QUERY_BUDGETS[url_name]:
+        with assert_query_budget('posts:index'):
+            client.get(reverse('posts:index'))
+    """
+    if budget is None:
+        budget = settings.QUERY_BUDGETS[url_name]
+    counter = QueryCounter()
+    with counter.installed():
+        yield counter
+    if counter.count > budget:
+        queries = '\n'.join(
+            f'{count} x {sql}' for sql, count in counter.shapes.most_common()
+        )
+        raise AssertionError(
+            f'{url_name}: {counter.count} SQL-запросов '
+            f'при бюджете {budget}:\n{queries}'
+        )
+
+
+@contextmanager
+def capture_on_commit_callbacks(execute=False):
+    """Собрать колбэки transaction.on_commit, добавленные внутри with,
+    и с execute выполнить их, как TestCase.captureOnCommitCallbacks
+    в Django 3.2: в TestCase транзакция не фиксируется никогда.
+    """
+    callbacks = []
+    start = len(connection.run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        callbacks += [
+            func for _, func in connection.run_on_commit[start:]
+        ]
+        if execute:
+            for callback in callbacks:
+                callback()
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с TASKS_EAGER: задачи core.tasks выполняются
+    сразу при постановке, а не после фиксации транзакции,
+    которой в TestCase не бывает.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.TASKS_EAGER = True
@@ -0,0 +1,235 @@
+import bisect
+import random
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group
+
+User = get_user_model()
+
+USER = 'user'
+GROUP = 'group'
+URL_NAMES = {USER: 'posts:profile', GROUP: 'posts:group_list'}
+# Журнал изменений индекса в кеше: процесс, изменивший индекс,
+# увеличивает счётчик LAST_KEY и кладёт изменение под его номером,
+# а остальные процессы, заметив новый номер, применяют пропущенные
+# изменения к своему индексу.
+LAST_KEY = 'autocomplete:last'
+CHANGE_PREFIX = 'autocomplete:change:'
+CHANGES_TIMEOUT = 60 * 60
+# Отставший больше чем на столько изменений индекс загружается заново.
+MAX_REPLAY = 1000
+UPDATE = 'update'
+REMOVE = 'remove'
+
+
+def normalize(text):
+    return text.strip().casefold().replace('ё', 'е')
+
+
+class PrefixIndex:
+    """Подсказки по префиксу: отсортированный список (ключ, вид, id).
+
+    Поиск — bisect к первому ключу не меньше префикса и проход
+    вперёд, пока ключи начинаются с префикса, поэтому стоимость
+    зависит от числа подсказок, а не от размера индекса.
+    Изменение копирует список за O(n), без обращения к базе, и заменяет
+    его целиком под блокировкой, поэтому поиск читает без блокировки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Отсортированные ключи и подсказки заменяются одной парой.
+        self._state = ([], {})
+        # Номер последнего применённого изменения журнала.
+        self.position = None
+
+    def __len__(self):
+        return len(self._state[1])
+
+    def replace(self, items):
+        """Заменить содержимое индекса: items — (вид, id, ключи, подсказка)."""
+        entries = []
+        stored = {}
+        for kind, pk, keys, item in items:
+            keys = _unique_keys(keys)
+            stored[kind, pk] = (keys, item)
+            entries += [(key, kind, pk) for key in keys]
+        entries.sort()
+        with self._lock:
+            self._state = (entries, stored)
+
+    def update(self, kind, pk, keys, item):
+        """Добавить или заменить подсказку; False, если она не изменилась."""
+        keys = _unique_keys(keys)
+        with self._lock:
+            entries, stored = self._state
+            if stored.get((kind, pk)) == (keys, item):
+                return False
+            entries, stored = self._without(entries, stored, kind, pk)
+            stored[kind, pk] = (keys, item)
+            for key in keys:
+                bisect.insort(entries, (key, kind, pk))
+            self._state = (entries, stored)
+        return True
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._state = self._without(*self._state, kind, pk)
+
+    @staticmethod
+    def _without(entries, stored, kind, pk):
+        # Копии без подсказки (kind, pk): старые списки могут читаться.
+        keys, _ = stored.get((kind, pk), ((), None))
+        stored = {
+            item_key: value for item_key, value in stored.items()
+            if item_key != (kind, pk)
+        }
+        removed = {(key, kind, pk) for key in keys}
+        return [entry for entry in entries if entry not in removed], stored
+
+    def lookup(self, prefix, limit):
+        """До limit подсказок, у которых какой-нибудь ключ
+        начинается с prefix, в порядке ключей.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries, items = self._state
+        found = {}
+        position = bisect.bisect_left(entries, (prefix,))
+        while position < len(entries) and len(found) < limit:
+            key, kind, pk = entries[position]
+            if not key.startswith(prefix):
+                break
+            stored = items.get((kind, pk))
+            if stored is not None:
+                found.setdefault((kind, pk), stored[1])
+            position += 1
+        return list(found.values())
+
+
+def _unique_keys(keys):
+    keys = (normalize(key) for key in keys if key)
+    return tuple(dict.fromkeys(key for key in keys if key))
+
+
+def user_item(user):
+    return (
+        USER,
+        user.pk,
+        [user.username],
+        {
+            'type': USER,
+            'value': user.username,
+            'label': user.get_full_name() or user.username,
+        },
+    )
+
+
+def group_item(group):
+    return (
+        GROUP,
+        group.pk,
+        [group.slug, group.title],
+        {'type': GROUP, 'value': group.slug, 'label': group.title},
+    )
+
+
+index = PrefixIndex()
+
+
+def load():
+    """Загрузить индекс из базы: вызывается при старте процесса
+    (yatube.wsgi) и когда журнал изменений не покрывает отставание.
+    """
+    # Счётчик начинается со случайного номера, а не с нуля: если его
+    # вытеснят из кеша, новые номера не совпадут с уже применёнными.
+    cache.add(LAST_KEY, random.randrange(2 ** 48), timeout=None)
+    position = cache.get(LAST_KEY)
+    users = User.objects.only('username', 'first_name', 'last_name')
+    groups = Group.objects.only('slug', 'title')
+    index.replace(
+        [user_item(user) for user in users.iterator()]
+        + [group_item(group) for group in groups.iterator()]
+    )
+    index.position = position
+
+
+def sync():
+    """Применить изменения, сделанные другими процессами."""
+    last = cache.get(LAST_KEY)
+    position = index.position
+    behind = None if None in (last, position) else last - position
+    if behind == 0:
+        return
+    if behind is None or not 0 < behind <= MAX_REPLAY:
+        load()
+        return
+    keys = [
+        f'{CHANGE_PREFIX}{position + step}' for step in range(1, behind + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        # Изменение вытеснено или ещё не записано.
+        load()
+        return
+    for key in keys:
+        _apply(changes[key])
+    index.position = last
+
+
+def lookup(prefix, limit=None):
+    sync()
+    return index.lookup(prefix, limit or settings.AUTOCOMPLETE_LIMIT)
+
+
+def _apply(change):
+    """Применить изменение к индексу; False, если ничего не поменялось."""
+    action, *args = change
+    if action == UPDATE:
+        return index.update(*args)
+    index.remove(*args)
+    return True
+
+
+def publish(change):
+    """Записать изменение в журнал для остальных процессов."""
+    try:
+        number = cache.incr(LAST_KEY)
+    except ValueError:
+        # Счётчик вытеснен: процессы заметят это и загрузят индекс.
+        return
+    cache.set(f'{CHANGE_PREFIX}{number}', change, CHANGES_TIMEOUT)
+    # Свой индекс уже содержит изменение. Если отставания не было,
+    # применять его при следующем поиске незачем.
+    if index.position == number - 1:
+        index.position = number
+
+
+def _changed(change):
+    # Вход пользователя сохраняет last_login, подсказка при этом
+    # не меняется, и другим процессам о нём знать незачем.
+    if _apply(change):
+        publish(change)
+
+
+def _on_commit(change):
+    # Откаченное изменение не должно попасть ни в индекс, ни в журнал.
+    transaction.on_commit(lambda: _changed(change))
+
+
+def update_user(user):
+    _on_commit((UPDATE, *user_item(user)))
+
+
+def update_group(group):
+    _on_commit((UPDATE, *group_item(group)))
+
+
+def remove(kind, pk):
+    _on_commit((REMOVE, kind, pk))
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core.cache_tags import get_versions, purge
+
+from .models import Follow, Group
+from .timeline import followed_celebrity_ids, get_celebrity_ids
+
+User = get_user_model()
+
+# Теги фрагментов лент (по id) и целых страниц для анонимов
+# (по аргументам URL, чтобы находить страницу без обращения к базе).
+INDEX = 'feed:index'
+INDEX_PAGE = 'page:index'
+
+
+def group_feed(group_id):
+    return f'feed:group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'feed:profile:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def group_page(slug):
+    return f'page:group:{slug}'
+
+
+def profile_page(username):
+    return f'page:profile:{username}'
+
+
+def post_page(post_id):
+    return f'page:post:{post_id}'
+
+
+def profile_pages(instance, *fields):
+    """Теги страниц профилей пользователей из полей fields объекта.
+
+    Уже загруженные связи (во view это обычно request.user)
+    обходятся без запроса, остальные имена читаются одним запросом.
+    """
+    tags = []
+    user_ids = []
+    for name in fields:
+        descriptor = getattr(type(instance), name)
+        if descriptor.is_cached(instance):
+            tags.append(profile_page(getattr(instance, name).username))
+        else:
+            user_ids.append(getattr(instance, descriptor.field.attname))
+    if user_ids:
+        usernames = User.objects.filter(
+            pk__in=user_ids
+        ).values_list('username', flat=True)
+        tags += [profile_page(username) for username in usernames]
+    return tags
+
+
+def index_page_tags():
+    return [INDEX_PAGE]
+
+
+def group_page_tags(slug):
+    return [group_page(slug)]
+
+
+def profile_page_tags(username):
+    return [profile_page(username)]
+
+
+def post_page_tags(post_id):
+    return [post_page(post_id)]
+
+
+def invalidate_post(post, group_ids, follow_feeds=True):
+    """Сбросить ленты и страницы, на которых виден пост.
+
+    Без follow_feeds ленты подписок не трогаются: новый пост попадает
+    в них при рассылке (posts.tasks.fan_out), которая их и сбрасывает.
+    """
+    author_id = post.author_id
+    group_ids = [group_id for group_id in group_ids if group_id]
+    tags = [INDEX, INDEX_PAGE, profile_feed(author_id), post_page(post.pk)]
+    tags += [group_feed(group_id) for group_id in group_ids]
+    if group_ids:
+        slugs = Group.objects.filter(
+            pk__in=group_ids
+        ).values_list('slug', flat=True)
+        tags += [group_page(slug) for slug in slugs]
+    tags += profile_pages(post, 'author')
+    if follow_feeds:
+        tags += follower_feeds(author_id)
+    purge(tags)
+
+
+def follower_feeds(author_id):
+    """Ленты подписок, в которые рассылаются посты автора."""
+    if author_id in get_celebrity_ids():
+        # Ленты подписчиков знаменитостей зависят от версии профиля.
+        return []
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    return [follow_feed(user_id) for user_id in followers]
+
+
+def get_feed_cache_context(request, *feeds):
+    """Ключ и срок хранения фрагмента ленты для тега {% cache %}.
+
+    Ключ меняется вместе с версиями лент и курсором страницы.
+    """
+    parts = get_versions(feeds)
+    parts += [request.GET.get('after', ''), request.GET.get('before', '')]
+    return {
+        'feed_cache_key': ':'.join(list(feeds) + parts),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def get_follow_feed_cache_context(request, user):
+    feeds = [follow_feed(user.pk)]
+    feeds += [
+        profile_feed(author_id)
+        for author_id in followed_celebrity_ids(user.pk)
+    ]
+    return get_feed_cache_context(request, *feeds)
@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, Tag, UserCounters
+
+User = get_user_model()
+
+USER_COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _shifted(name, delta):
+    # Разошедшийся счётчик не должен уходить ниже нуля.
+    return Greatest(F(name) + delta, 0)
+
+
+def add_to_user(user_id, **deltas):
+    """Изменить счётчики пользователя, например add_to_user(1, posts_count=1).
+
+    Строку не создаём: пользователь может быть в процессе удаления,
+    а отсутствующие строки восстанавливает reconcile_counters.
+    """
+    UserCounters.objects.filter(user_id=user_id).update(**{
+        name: _shifted(name, delta) for name, delta in deltas.items()
+    })
+
+
+def add_to_post(post_id, comments_count):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shifted('comments_count', comments_count)
+    )
+
+
+def add_to_tags(names, posts_count):
+    Tag.objects.filter(name__in=names).update(
+        posts_count=_shifted('posts_count', posts_count)
+    )
+
+
+def _counts(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).values_list(
+            field
+        ).annotate(Count('id')).order_by()
+    )
+
+
+def reconcile_users(batch_size):
+    """Пересчитать счётчики пользователей пачками по batch_size.
+
+    Возвращает количество исправленных или созданных строк.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            User.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return fixed
+        last_id = ids[-1]
+        actual = {
+            'posts_count': _counts(Post.objects, 'author', ids),
+            'followers_count': _counts(Follow.objects, 'author', ids),
+            'following_count': _counts(Follow.objects, 'user', ids),
+        }
+        stored = UserCounters.objects.in_bulk(ids)
+        missing = []
+        changed = []
+        for user_id in ids:
+            values = {
+                name: actual[name].get(user_id, 0) for name in USER_COUNTERS
+            }
+            counters = stored.get(user_id)
+            if counters is None:
+                missing.append(UserCounters(user_id=user_id, **values))
+            elif any(getattr(counters, n) != v for n, v in values.items()):
+                for name, value in values.items():
+                    setattr(counters, name, value)
+                changed.append(counters)
+        UserCounters.objects.bulk_create(missing)
+        UserCounters.objects.bulk_update(changed, USER_COUNTERS)
+        fixed += len(missing) + len(changed)
+
+
+def reconcile_posts(batch_size):
+    """Пересчитать количество комментариев у постов пачками по batch_size."""
+    fixed = 0
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk').only(
+                'comments_count'
+            )[:batch_size]
+        )
+        if not posts:
+            return fixed
+        last_id = posts[-1].pk
+        actual = _counts(Comment.objects, 'post', [post.pk for post in posts])
+        changed = []
+        for post in posts:
+            if post.comments_count != actual.get(post.pk, 0):
+                post.comments_count = actual.get(post.pk, 0)
+                changed.append(post)
+        Post.objects.bulk_update(changed, ['comments_count'])
+        fixed += len(changed)
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -8,6 +11,35 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['text', 'group', 'image']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Картинку, отклонённую ещё при загрузке (posts.uploads),
+        # поле не получает, а ошибку показывает clean_image.
+        self.upload_error = getattr(
+            self.files.get('image'), 'upload_error', None
+        )
+        if self.upload_error:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.upload_error:
+            raise forms.ValidationError(
+                self.upload_error, code='upload_error'
+            )
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.POST_IMAGE_MAX_BYTES:
+            raise forms.ValidationError(
+                uploads.bytes_error(), code='too_large'
+            )
+        # ImageField прочитал только заголовок и проверил структуру файла.
+        size_error = uploads.size_error(*image.image.size)
+        if size_error:
+            raise forms.ValidationError(size_error, code='too_large')
+        return uploads.normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,72 @@
+import base64
+import io
+import logging
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Ширина превью-заглушки; высота следует пропорциям карточки.
+PLACEHOLDER_WIDTH = 24
+PLACEHOLDER_QUALITY = 40
+ORIENTATION = 0x0112
+# EXIF-ориентации с поворотом на 90°: до поворота ширина и высота
+# картинки поменяны местами.
+TRANSPOSED = {5, 6, 7, 8}
+
+
+def placeholder_size():
+    geometry, _ = settings.POST_THUMBNAILS['card']
+    width, height = map(int, geometry.split('x'))
+    return PLACEHOLDER_WIDTH, max(1, round(PLACEHOLDER_WIDTH * height / width))
+
+
+def describe(file_):
+    """Размеры картинки и её крошечная копия в виде data URI.
+
+    Превью обрезается по центру в пропорциях карточки,
+    как и миниатюра, которую оно заменяет до загрузки.
+    """
+    size = placeholder_size()
+    with Image.open(file_) as image:
+        # Размеры берутся до draft, который уменьшает картинку.
+        # draft работает только до декодирования, то есть до поворота,
+        # поэтому и размеры, и рамка для него — в ориентации файла.
+        width, height = image.size
+        box = (size[0] * 2, size[1] * 2)
+        if image.getexif().get(ORIENTATION) in TRANSPOSED:
+            width, height = height, width
+            box = box[::-1]
+        image.draft('RGB', box)
+        image = ImageOps.exif_transpose(image)
+        preview = ImageOps.fit(image.convert('RGB'), size, Image.BOX)
+    buffer = io.BytesIO()
+    preview.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY, optimize=True)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{data}'
+
+
+def fill_empty(post):
+    post.image_width = post.image_height = None
+    post.image_placeholder = ''
+
+
+def fill(post, file_):
+    """Заполнить image_width, image_height и image_placeholder поста
+    по файлу картинки. Нечитаемая картинка оставляет поля пустыми.
+    """
+    position = file_.tell()
+    try:
+        file_.seek(0)
+        width, height, placeholder = describe(file_)
+    except (OSError, ValueError):
+        logger.warning('Не удалось прочитать картинку %s', post.image.name)
+        fill_empty(post)
+        return
+    finally:
+        # Файл ещё будет сохранён в хранилище целиком.
+        file_.seek(position)
+    post.image_width = width
+    post.image_height = height
+    post.image_placeholder = placeholder
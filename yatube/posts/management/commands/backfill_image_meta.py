@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и превью-заглушки картинок '
+        'у постов, загруженных до их появления.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        filled = failed = 0
+        last_id = 0
+        while True:
+            posts = Post.objects.filter(
+                pk__gt=last_id,
+                image_width__isnull=True
+            ).exclude(image='').order_by('pk').only(
+                'image', 'author_id', 'group_id'
+            )
+            posts = list(posts[:options['batch_size']])
+            if not posts:
+                break
+            last_id = posts[-1].pk
+            changed = []
+            for post in posts:
+                try:
+                    with post.image.open('rb') as file_:
+                        images.fill(post, file_)
+                except OSError:
+                    images.fill_empty(post)
+                if post.image_width is None:
+                    failed += 1
+                    continue
+                changed.append(post)
+            Post.objects.bulk_update(
+                changed,
+                ['image_width', 'image_height', 'image_placeholder']
+            )
+            for post in changed:
+                caching.invalidate_post(post, {post.group_id})
+            filled += len(changed)
+        self.stdout.write(
+            f'Заполнено картинок: {filled}, не удалось прочитать: {failed}'
+        )
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from PIL import Image
+
+from posts.forms import PostForm
+
+# Имя → (размер, формат, режим). Последняя — «бомба»: маленький PNG,
+# который после декодирования занял бы сотни мегабайт.
+CASES = {
+    'jpeg-1mp': ((1200, 800), 'JPEG', 'RGB'),
+    'jpeg-12mp': ((4000, 3000), 'JPEG', 'RGB'),
+    'png-12mp': ((4000, 3000), 'PNG', 'RGB'),
+    'png-bomb': ((20000, 20000), 'PNG', '1'),
+}
+
+
+def make_case(directory, name, size, format_, mode):
+    path = os.path.join(directory, f'{name}.{format_.lower()}')
+    image = Image.new(mode, size)
+    # Шум, чтобы файл не сжимался до пары килобайт.
+    noise = Image.effect_noise((size[0] // 8, size[1] // 8), 64)
+    if mode != '1':
+        image.paste(noise.convert(mode).resize(size))
+    image.save(path, format_)
+    return path
+
+
+def peak_rss():
+    # ru_maxrss в Linux — в килобайтах.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(path):
+    """Загрузить файл через обработчики загрузки и PostForm
+    в отдельном процессе и вернуть прирост пикового RSS.
+    """
+    with open(path, 'rb') as file_:
+        request = RequestFactory().post('/create/', {
+            'text': 'Тест',
+            'image': file_,
+        })
+    before = peak_rss()
+    started = time.monotonic()
+    form = PostForm(request.POST, request.FILES)
+    valid = form.is_valid()
+    elapsed = time.monotonic() - started
+    if valid and form.cleaned_data['image']:
+        image = form.cleaned_data['image']
+        result = f'принята, {image.size // 1024} КБ'
+    else:
+        result = '; '.join(form.errors.get('image', ['отклонена']))
+    return peak_rss() - before, elapsed, result
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает прирост пикового RSS процесса при проверке '
+        'и пересохранении загружаемых картинок разного размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--case',
+            action='append',
+            dest='cases',
+            choices=list(CASES),
+            help='Какие картинки загружать (по умолчанию все).'
+        )
+
+    def handle(self, *args, **options):
+        names = options['cases'] or list(CASES)
+        directory = tempfile.mkdtemp()
+        # Каждая загрузка — в новом процессе: пиковый RSS не убывает,
+        # и предыдущая загрузка исказила бы замер следующей.
+        context = multiprocessing.get_context('spawn')
+        try:
+            for name in names:
+                path = make_case(directory, name, *CASES[name])
+                with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=context,
+                    initializer=django.setup
+                ) as executor:
+                    rss, elapsed, result = executor.submit(
+                        measure, path
+                    ).result()
+                self.stdout.write(
+                    f'{name}: файл {os.path.getsize(path) // 1024} КБ, '
+                    f'пиковый RSS +{rss / 2 ** 20:.1f} МБ, '
+                    f'{elapsed * 1000:.0f} мс, {result}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,132 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import caching, media, thumbnails
+from posts.models import Post, StoredImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Объединяет одинаковые картинки постов в один файл, '
+        'пересчитывает ссылки на файлы и удаляет ненужные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help='Не удалять повторяющиеся и ненужные файлы и их миниатюры.'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help=(
+                'Файлы без ссылок моложе стольких секунд не удаляются: '
+                'пост с ними может ещё сохраняться.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        self.storage = media.storage()
+        self.keep_old = options['keep_old']
+        batch_size = options['batch_size']
+        counts = {'merged': 0, 'registered': 0, 'missing': 0}
+        last_name = ''
+        while True:
+            names = list(
+                Post.objects.filter(image__gt=last_name).order_by(
+                    'image'
+                ).values_list('image', flat=True).distinct()[:batch_size]
+            )
+            if not names:
+                break
+            last_name = names[-1]
+            known = set(
+                StoredImage.objects.filter(
+                    name__in=names
+                ).values_list('name', flat=True)
+            )
+            for name in names:
+                if name not in known:
+                    counts[self.register(name)] += 1
+            self.stdout.write(
+                f'Объединено: {counts["merged"]}, '
+                f'учтено: {counts["registered"]}, '
+                f'нет файла: {counts["missing"]}'
+            )
+        recounted, pruned = self.reconcile(batch_size, options['min_age'])
+        self.stdout.write(
+            f'Готово, объединено файлов: {counts["merged"]}, '
+            f'исправлено счётчиков ссылок: {recounted}, '
+            f'удалено ненужных файлов: {pruned}'
+        )
+
+    def register(self, name):
+        """Учесть файл, загруженный до хранения по хешу,
+        или переключить его посты на уже известную копию.
+        """
+        if not self.storage.exists(name):
+            return 'missing'
+        with self.storage.open(name) as file_:
+            digest = media.sha256(file_)
+        blob = StoredImage.objects.filter(sha256=digest).first()
+        if blob is None or not self.storage.exists(blob.name):
+            StoredImage.objects.update_or_create(
+                sha256=digest, defaults={'name': name}
+            )
+            return 'registered'
+        thumbnails.regenerate(blob.name, list(thumbnails.specs()))
+        sharing = list(
+            Post.objects.filter(image=name).only('author_id', 'group_id')
+        )
+        Post.objects.filter(image=name).update(image=blob.name)
+        for post in sharing:
+            caching.invalidate_post(post, {post.group_id})
+        if not self.keep_old:
+            self.delete(name)
+        return 'merged'
+
+    def reconcile(self, batch_size, min_age):
+        """Пересчитать ссылки на файлы и удалить файлы без ссылок."""
+        recounted = pruned = 0
+        cutoff = timezone.now() - datetime.timedelta(seconds=min_age)
+        last_id = 0
+        while True:
+            blobs = list(
+                StoredImage.objects.filter(pk__gt=last_id).order_by('pk')[
+                    :batch_size
+                ]
+            )
+            if not blobs:
+                break
+            last_id = blobs[-1].pk
+            refs = dict(
+                Post.objects.filter(
+                    image__in=[blob.name for blob in blobs]
+                ).values_list('image').annotate(Count('id')).order_by()
+            )
+            changed = []
+            for blob in blobs:
+                count = refs.get(blob.name, 0)
+                if not count and not self.keep_old and blob.created < cutoff:
+                    blob.delete()
+                    self.delete(blob.name)
+                    pruned += 1
+                elif blob.refs != count:
+                    blob.refs = count
+                    changed.append(blob)
+            StoredImage.objects.bulk_update(changed, ['refs'])
+            recounted += len(changed)
+        return recounted, pruned
+
+    def delete(self, name):
+        # Вместе со ссылками на миниатюры удаляет и их файлы.
+        default.kvstore.delete(ImageFile(name, self.storage))
+        self.storage.delete(name)
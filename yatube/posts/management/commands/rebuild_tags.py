@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.tags import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Собирает индекс хештегов заново и исправляет счётчики тегов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = rebuild(options['batch_size'])
+        self.stdout.write(f'Исправлено счётчиков тегов: {fixed}')
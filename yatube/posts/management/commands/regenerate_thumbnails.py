@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import caching, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры картинок постов '
+        'в нескольких процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias',
+            action='append',
+            dest='aliases',
+            help='Какие миниатюры создавать (по умолчанию все).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Число процессов; 0 — в текущем процессе.'
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            default=0,
+            help='Продолжить с постов, id которых больше указанного.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать и уже существующие миниатюры.'
+        )
+
+    def handle(self, *args, **options):
+        specs = thumbnails.specs()
+        aliases = options['aliases'] or list(specs)
+        unknown = set(aliases) - set(specs)
+        if unknown:
+            raise CommandError(f'Неизвестные миниатюры: {sorted(unknown)}')
+        if options['workers'] == 0:
+            self.run(map, aliases, options)
+            return
+        # Дочерние процессы не должны унаследовать открытые соединения.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=django.setup
+        ) as executor:
+            self.run(executor.map, aliases, options)
+
+    def run(self, map_, aliases, options):
+        started = time.monotonic()
+        images = created = 0
+        last_id = options['start_id']
+        while True:
+            posts = Post.objects.filter(
+                pk__gt=last_id
+            ).exclude(image='').order_by('pk').only(
+                'image', 'author_id', 'group_id'
+            )
+            posts = list(posts[:options['batch_size']])
+            if not posts:
+                break
+            if options['force']:
+                names = [post.image.name for post in posts]
+            else:
+                names = self.missing([post.image for post in posts], aliases)
+            # Одинаковые картинки хранятся одним файлом (posts.media):
+            # два процесса не должны строить его миниатюры одновременно.
+            names = list(dict.fromkeys(names))
+            results = dict(zip(names, map_(
+                thumbnails.regenerate,
+                names,
+                [aliases] * len(names),
+                [options['force']] * len(names)
+            )))
+            for post in posts:
+                if results.get(post.image.name):
+                    # Закешированные страницы ссылаются на старые миниатюры.
+                    caching.invalidate_post(post, {post.group_id})
+            images += len(posts)
+            created += sum(results.values())
+            last_id = posts[-1].pk
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Картинок: {images}, создано миниатюр: {created}, '
+                f'{images / elapsed:.1f} картинок/с, '
+                f'последний id: {last_id}'
+            )
+        self.stdout.write(f'Готово, создано миниатюр: {created}')
+
+    @staticmethod
+    def missing(images, aliases):
+        """Имена картинок, у которых нет хотя бы одной из миниатюр."""
+        found = thumbnails.lookup_many(images, aliases)
+        missing = {name for (name, _), thumb in found.items() if not thumb}
+        return [image.name for image in images if image.name in missing]
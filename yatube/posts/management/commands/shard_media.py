@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import ShardedFileSystemStorage
+from posts import caching, thumbnails
+from posts.models import Post, StoredImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из общего каталога в подкаталоги, '
+        'не останавливая сайт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help='Не удалять исходные файлы и их миниатюры.'
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        self.storage = field.storage
+        if not isinstance(self.storage, ShardedFileSystemStorage):
+            raise CommandError(
+                'DEFAULT_FILE_STORAGE не раскладывает файлы по подкаталогам.'
+            )
+        moved = skipped = 0
+        last_id = 0
+        while True:
+            posts = Post.objects.filter(pk__gt=last_id).exclude(
+                image=''
+            ).order_by('pk').only('image', 'author_id', 'group_id')
+            posts = list(posts[:options['batch_size']])
+            if not posts:
+                break
+            last_id = posts[-1].pk
+            for post in posts:
+                if self.storage.is_sharded(post.image.name, field.upload_to):
+                    continue
+                if self.move(post, options['keep_old']):
+                    moved += 1
+                else:
+                    skipped += 1
+            self.stdout.write(
+                f'Перенесено: {moved}, пропущено: {skipped}, '
+                f'последний id: {last_id}'
+            )
+        self.stdout.write(f'Готово, перенесено файлов: {moved}')
+
+    def move(self, post, keep_old):
+        """Скопировать файл, подготовить миниатюры и только затем
+        переключить пост на новое имя: читатели всё время видят
+        существующий файл.
+        """
+        old = post.image.name
+        if not self.storage.exists(old):
+            return False
+        with self.storage.open(old) as file_:
+            new = self.storage.save(self.storage.generate_filename(old), file_)
+        thumbnails.generate(new)
+        # Файл может быть общим для нескольких постов (posts.media),
+        # а пост могли изменить, пока файл копировался.
+        sharing = list(
+            Post.objects.filter(image=old).only('author_id', 'group_id')
+        )
+        if not Post.objects.filter(image=old).update(image=new):
+            self.delete(new)
+            return False
+        StoredImage.objects.filter(name=old).update(name=new)
+        for shared in sharing:
+            caching.invalidate_post(shared, {shared.group_id})
+        if not keep_old:
+            self.delete(old)
+        return True
+
+    def delete(self, name):
+        # Вместе со ссылками на миниатюры удаляет и их файлы.
+        default.kvstore.delete(ImageFile(name, self.storage))
+        self.storage.delete(name)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.metrics import get_counters
+from posts.timeline import METRICS
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько чтений и записей обслужила каждая схема ленты.'
+
+    def handle(self, *args, **options):
+        for name, value in get_counters(METRICS).items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,92 @@
+import datetime
+import hashlib
+import posixpath
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from core.storage import ShardedFileSystemStorage
+
+from .models import Post, StoredImage
+
+CHUNK_SIZE = 64 * 1024
+
+
+def sha256(file_):
+    """SHA-256 содержимого файла; читается кусками, позиция сохраняется."""
+    position = file_.tell()
+    file_.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file_.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file_.seek(position)
+    return digest.hexdigest()
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def upload_filename(filename):
+    """Путь для нового файла картинки с учётом upload_to поля."""
+    field = Post._meta.get_field('image')
+    dirname = datetime.datetime.now().strftime(field.upload_to)
+    return posixpath.join(dirname, field.storage.get_valid_name(filename))
+
+
+class _Written:
+    """Колбэк transaction.on_commit для только что записанного файла.
+
+    Обработчика отката в Django нет, но при откате транзакции
+    (или точки сохранения) её колбэки выбрасываются невызванными.
+    Тогда пост и StoredImage не сохранились, и файл удаляется вместе
+    с колбэком, чтобы не остаться в хранилище без ссылок.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.committed = False
+
+    def __call__(self):
+        self.committed = True
+
+    def __del__(self):
+        if not self.committed:
+            storage().delete(self.name)
+
+
+def store(post):
+    """Сохранить загруженную картинку поста по хешу содержимого.
+
+    Если такая картинка уже есть, пост ссылается на существующий файл
+    (и его миниатюры), а загрузка не записывается.
+    """
+    field_file = post.image
+    upload = field_file.file
+    digest = sha256(upload)
+    files = storage()
+    blob = StoredImage.objects.filter(sha256=digest).first()
+    if blob is not None and files.exists(blob.name):
+        name = blob.name
+    else:
+        filename = upload_filename(posixpath.basename(field_file.name))
+        if isinstance(files, ShardedFileSystemStorage):
+            filename = files.content_filename(filename, digest)
+        name = files.save(filename, upload)
+        transaction.on_commit(_Written(name))
+        # Одновременная загрузка того же файла перепишет имя на своё;
+        # ссылки на оба файла сверяет deduplicate_media.
+        StoredImage.objects.update_or_create(
+            sha256=digest, defaults={'name': name}
+        )
+    field_file.name = name
+    field_file._committed = True
+
+
+def add_refs(name, refs):
+    """Изменить число ссылок на файл name."""
+    if name:
+        StoredImage.objects.filter(name=name).update(
+            refs=Greatest(F('refs') + refs, 0)
+        )
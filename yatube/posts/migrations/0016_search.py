@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from posts import search
+    search.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from posts import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Полнотекстовый индекс FTS5 (posts.search); только для SQLite."""
+
+    dependencies = [
+        ('posts', '0015_stored_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
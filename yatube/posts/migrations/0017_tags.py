@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:39
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_tags(apps, schema_editor):
+    from posts.tags import parse
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    TagEntry = apps.get_model('posts', 'TagEntry')
+    TagEntry.objects.bulk_create(
+        (
+            TagEntry(tag=name, post_id=post_id, pub_date=pub_date)
+            for post_id, text, pub_date in Post.objects.values_list(
+                'id', 'text', 'pub_date'
+            ).iterator()
+            for name in parse(text)
+        ),
+        batch_size=1000
+    )
+    Tag.objects.bulk_create(
+        (
+            Tag(name=name, posts_count=count)
+            for name, count in TagEntry.objects.values_list(
+                'tag'
+            ).annotate(Count('id')).order_by()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Тег')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=50)),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_entries', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tagentry',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='tag_entry_tag_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagentry',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_tag_entry'),
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
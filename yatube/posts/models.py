@@ -17,6 +17,26 @@ class Group(models.Model):
         return reverse('posts:group_list', args=[self.slug])
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Посты для ленты: всё, что выводит карточка поста, одним запросом."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'image_width',
+            'image_height',
+            'image_placeholder',
+            'comments_count',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__slug',
+            'group__title',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст')
     pub_date = models.DateTimeField(
@@ -40,11 +60,51 @@ class Post(models.Model):
     image = models.ImageField(
         upload_to='posts/',
         blank=True,
+        db_index=True,
         verbose_name='Картинка'
     )
+    # Заполняются при загрузке картинки (posts.images), чтобы шаблонам
+    # не приходилось открывать файл.
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name='Высота картинки',
+    )
+    image_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Превью картинки',
+        help_text='Крошечная копия картинки в виде data URI',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -74,6 +134,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -98,3 +164,154 @@ class Follow(models.Model):
                 name='unique_follow'
             ),
         ]
+        indexes = [
+            # Подписчики автора: рассылка постов и счётчики.
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class StoredImage(models.Model):
+    """Файл картинки, общий для всех постов с одинаковым содержимым.
+
+    refs — число постов, ссылающихся на файл; обновляется вместе
+    с постами, расхождения исправляет команда deduplicate_media.
+    """
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='SHA-256 содержимого',
+    )
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Файл',
+    )
+    refs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата загрузки',
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, чтобы не считать их COUNT(*) при каждом показе.
+
+    Обновляются вместе с постами, комментариями и подписками,
+    расхождения исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Готовая лента подписок: пост, разосланный подписчику при публикации.
+
+    pub_date копируется из поста, чтобы лента читалась
+    одним диапазоном по индексу (user, -pub_date, -post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+
+class Tag(models.Model):
+    """Хештег из текста постов (posts.tags) и число постов с ним.
+
+    posts_count обновляется вместе с постами, расхождения
+    исправляет команда rebuild_tags.
+    """
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Тег',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов',
+    )
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('posts:tag_list', args=[self.name])
+
+
+class TagEntry(models.Model):
+    """Обратный индекс хештегов: пост, в тексте которого есть тег.
+
+    pub_date копируется из поста, чтобы лента тега читалась
+    одним диапазоном по индексу (tag, -pub_date, -post).
+    """
+    tag = models.CharField(max_length=50)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_entries',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'],
+                name='unique_tag_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='tag_entry_tag_pub_date_idx'
+            ),
+        ]
@@ -0,0 +1,211 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовый индекс SQLite FTS5 по текстам постов и комментариев.
+# Таблицы индекса хранят только токены (external content), а текст
+# берут из posts_post и posts_comment; в синхронном состоянии их держат
+# триггеры, поэтому индекс видит и изменения в обход моделей.
+INDEXES = {
+    'posts_post_fts': 'posts_post',
+    'posts_comment_fts': 'posts_comment',
+}
+# unicode61 приводит кириллицу к нижнему регистру, а remove_diacritics
+# превращает «ё» в «е».
+TOKENIZE = 'unicode61 remove_diacritics 2'
+
+# Вес совпадения в комментарии относительно совпадения в самом посте.
+COMMENT_WEIGHT = 0.5
+
+TOKEN_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-яё]')
+# Окончания русских слов, от длинных к коротким. Основа ищется
+# по префиксу, поэтому «кошками» находит «кошка» и «кошки».
+ENDINGS = sorted(
+    set((
+        'иями ями ами ией ием иях ях ах ою ею ей ой ий ый ая яя ое ее '
+        'ые ие ым им ом ем ую юю ого его ому ему ыми ими ых их ия ья '
+        'ов ев ам ям ум ью ть ти ет ют ит ат ят ешь ишь ем им ете ите '
+        'ла ло ли ся сь а я о е ы и у ю ь й'
+    ).split()),
+    key=len,
+    reverse=True
+)
+MIN_STEM = 3
+
+
+def _create_sql(index, table):
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"text, content='{table}', content_rowid='id', "
+        f"tokenize='{TOKENIZE}')",
+    ]
+
+
+def _trigger_sql(index, table):
+    insert = f'INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);'
+    delete = (
+        f"INSERT INTO {index}({index}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text);"
+    )
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT '
+        f'ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE '
+        f'ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF text '
+        f'ON {table} BEGIN {delete} {insert} END',
+    ]
+
+
+def install(connection_):
+    """Создать индекс и триггеры, которых нет, и заполнить новый индекс.
+
+    Вызывается миграцией и после каждого migrate: SQLite пересоздаёт
+    таблицу при изменении её полей, и триггеры пропадают вместе
+    со старой таблицей.
+    """
+    if connection_.vendor != 'sqlite':
+        return
+    with connection_.cursor() as cursor:
+        existing = {
+            name for name, in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        for index, table in INDEXES.items():
+            if table not in existing:
+                continue
+            for sql in _create_sql(index, table) + _trigger_sql(index, table):
+                cursor.execute(sql)
+            if index not in existing:
+                cursor.execute(
+                    f"INSERT INTO {index}({index}) VALUES ('rebuild')"
+                )
+
+
+def uninstall(connection_):
+    if connection_.vendor != 'sqlite':
+        return
+    with connection_.cursor() as cursor:
+        for index in INDEXES:
+            cursor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+def stem(word):
+    """Грубая основа слова: русское окончание отбрасывается,
+    если от слова остаётся хотя бы MIN_STEM букв.
+    """
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.search(word):
+        return word
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def terms(query):
+    """Основы слов запроса без повторов, в порядке появления."""
+    return list(dict.fromkeys(stem(word) for word in TOKEN_RE.findall(query)))
+
+
+def match_expression(query):
+    """Выражение FTS5 MATCH: все основы запроса как префиксы.
+
+    Каждая основа берётся в кавычки, поэтому операторы FTS5
+    из пользовательского ввода не действуют.
+    """
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+class RawSubquery(RawSQL):
+    """Подзапрос для __in. RawSQL сам берёт SQL в скобки, и вместе
+    со скобками лукапа получается IN ((SELECT ...)): SQLite считает
+    такой подзапрос скалярным и сравнивает только с первой строкой.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def _rank_sql():
+    # bm25 тем меньше, чем лучше совпадение; совпадения в комментариях
+    # учитываются с меньшим весом.
+    return (
+        'SELECT MIN(rank) FROM ('
+        'SELECT posts_post_fts.rank AS rank FROM posts_post_fts '
+        'WHERE posts_post_fts MATCH %s '
+        'AND posts_post_fts.rowid = "posts_post"."id" '
+        'UNION ALL '
+        f'SELECT posts_comment_fts.rank * {COMMENT_WEIGHT} '
+        'FROM posts_comment_fts '
+        'JOIN posts_comment ON posts_comment.id = posts_comment_fts.rowid '
+        'WHERE posts_comment_fts MATCH %s '
+        'AND posts_comment.post_id = "posts_post"."id")'
+    )
+
+
+def _matching_posts_sql():
+    return (
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s '
+        'UNION '
+        'SELECT post_id FROM posts_comment WHERE id IN ('
+        'SELECT rowid FROM posts_comment_fts '
+        'WHERE posts_comment_fts MATCH %s)'
+    )
+
+
+def search_posts(queryset, query):
+    """Посты из queryset, в тексте которых или в комментариях к которым
+    есть все слова запроса, с рангом rank (чем меньше, тем лучше).
+    """
+    expression = match_expression(query)
+    if not expression:
+        return _unranked(queryset).none()
+    if connection.vendor != 'sqlite':
+        return _search_posts_fallback(queryset, query)
+    return queryset.filter(
+        pk__in=RawSubquery(_matching_posts_sql(), [expression, expression])
+    ).annotate(
+        rank=RawSQL(
+            _rank_sql(), [expression, expression], output_field=FloatField()
+        )
+    )
+
+
+def search_comments(queryset, query):
+    """Комментарии из queryset со всеми словами запроса."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if connection.vendor != 'sqlite':
+        return queryset.filter(_contains_all('text', query))
+    return queryset.filter(pk__in=RawSubquery(
+        'SELECT rowid FROM posts_comment_fts '
+        'WHERE posts_comment_fts MATCH %s',
+        [expression]
+    ))
+
+
+def _contains_all(field, query):
+    condition = Q()
+    for term in terms(query):
+        condition &= Q(**{f'{field}__icontains': term})
+    return condition
+
+
+def _unranked(queryset):
+    return queryset.annotate(rank=RawSQL('0', [], output_field=FloatField()))
+
+
+def _search_posts_fallback(queryset, query):
+    # Без FTS5 ищем подстроки; ранг у всех найденных одинаковый.
+    return _unranked(queryset).filter(
+        _contains_all('text', query)
+        | Q(pk__in=queryset.model.objects.filter(
+            _contains_all('comments__text', query)
+        ).values('pk'))
+    )
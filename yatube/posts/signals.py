@@ -0,0 +1,201 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.cache_tags import purge
+from core.tasks import enqueue
+
+from . import (
+    autocomplete,
+    caching,
+    counters,
+    images,
+    media,
+    search,
+    tags,
+    tasks,
+    timeline,
+)
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    if instance.image and not instance.image._committed:
+        # Загруженный файл ещё в памяти: читаем его до сохранения.
+        images.fill(instance, instance.image.file)
+        media.store(instance)
+    elif not instance.image:
+        images.fill_empty(instance)
+    # Пост, перенесённый в другую группу, пропадает из ленты прежней.
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    instance._previous_text = ''
+    if instance.pk is not None:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first()
+        if previous:
+            (
+                instance._previous_group_id,
+                instance._previous_image,
+                instance._previous_text,
+            ) = previous
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        slugs = Group.objects.filter(pk=instance.pk).values_list(
+            'slug', flat=True
+        )
+        purge([caching.group_page(slug) for slug in slugs])
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    autocomplete.update_group(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # Посты остаются без группы обычным UPDATE, без сигналов,
+    # поэтому страницы, где видна ссылка на группу, сбрасываем здесь.
+    posts = Post.objects.filter(group_id=instance.pk).values_list(
+        'id', 'author_id', 'author__username'
+    )
+    tags = [
+        caching.INDEX,
+        caching.INDEX_PAGE,
+        caching.group_feed(instance.pk),
+        caching.group_page(instance.slug),
+    ]
+    for post_id, author_id, username in posts.iterator():
+        tags += [
+            caching.post_page(post_id),
+            caching.profile_feed(author_id),
+            caching.profile_page(username),
+        ]
+    purge(list(dict.fromkeys(tags)))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    autocomplete.remove(autocomplete.GROUP, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    else:
+        purge([caching.profile_page(instance.username)])
+    autocomplete.update_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.remove(autocomplete.USER, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_user(instance.author_id, posts_count=1)
+        # Подписчиков может быть много: рассылка идёт через очередь.
+        enqueue(tasks.fan_out, instance.pk, key=f'fan_out:{instance.pk}')
+    if instance.image.name != instance._previous_image:
+        media.add_refs(instance.image.name, 1)
+        media.add_refs(instance._previous_image, -1)
+    tags.sync(instance, instance._previous_text)
+    caching.invalidate_post(
+        instance,
+        {instance.group_id, instance._previous_group_id},
+        follow_feeds=not created
+    )
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    tags.remove(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.add_to_user(instance.author_id, posts_count=-1)
+    media.add_refs(instance.image.name, -1)
+    caching.invalidate_post(instance, {instance.group_id})
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_post(instance.post_id, comments_count=1)
+        _invalidate_comment_post(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.add_to_post(instance.post_id, comments_count=-1)
+    _invalidate_comment_post(instance)
+
+
+def _invalidate_comment_post(comment):
+    # Карточка поста в лентах показывает число комментариев.
+    if Comment.post.is_cached(comment):
+        post = comment.post
+    else:
+        post = Post.objects.filter(pk=comment.post_id).only(
+            'author_id', 'group_id'
+        ).first()
+    if post:
+        caching.invalidate_post(post, {post.group_id})
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_user(instance.author_id, followers_count=1)
+        counters.add_to_user(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        _purge_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.add_to_user(instance.author_id, followers_count=-1)
+    counters.add_to_user(instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    if instance.author_id in timeline.get_celebrity_ids():
+        # Автор мог опуститься ниже порога знаменитости.
+        enqueue(
+            tasks.demote,
+            instance.author_id,
+            key=f'demote:{instance.author_id}'
+        )
+    _purge_follow(instance)
+
+
+def _purge_follow(follow):
+    # Профили обоих пользователей показывают счётчики подписок.
+    purge(
+        [caching.follow_feed(follow.user_id)]
+        + caching.profile_pages(follow, 'user', 'author')
+    )
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    # Изменение полей поста или комментария пересоздаёт таблицу
+    # вместе с триггерами поиска; возвращаем их.
+    if sender.name == 'posts':
+        search.install(connections[using])
@@ -0,0 +1,116 @@
+import re
+
+from django.db import transaction
+from django.db.models import Count
+
+from . import counters
+from .models import Post, Tag, TagEntry
+from .utils import CursorPaginator, index_keys
+
+MAX_LENGTH = Tag._meta.get_field('name').max_length
+# «#тег» в начале слова; «a#b» и «&#123;» тегами не считаются.
+TAG_RE = re.compile(r'(?<![\w&])#(\w+)')
+
+
+def parse(text):
+    """Хештеги текста в нижнем регистре без повторов, в порядке появления.
+
+    Слишком длинные теги пропускаются.
+    """
+    names = (name.lower() for name in TAG_RE.findall(text or ''))
+    return list(dict.fromkeys(
+        name for name in names if len(name) <= MAX_LENGTH
+    ))
+
+
+def sync(post, previous_text):
+    """Привести индекс и счётчики тегов к тексту поста.
+
+    Пишет в базу, только если набор тегов изменился.
+    """
+    previous = set(parse(previous_text))
+    current = set(parse(post.text))
+    added = current - previous
+    removed = previous - current
+    if added:
+        TagEntry.objects.bulk_create(
+            [
+                TagEntry(tag=name, post_id=post.pk, pub_date=post.pub_date)
+                for name in added
+            ],
+            ignore_conflicts=True
+        )
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in added], ignore_conflicts=True
+        )
+        counters.add_to_tags(added, 1)
+    if removed:
+        TagEntry.objects.filter(post_id=post.pk, tag__in=removed).delete()
+        counters.add_to_tags(removed, -1)
+
+
+def remove(post_id):
+    """Уменьшить счётчики тегов удаляемого поста.
+
+    Строки индекса удаляются каскадом вместе с постом.
+    """
+    names = list(
+        TagEntry.objects.filter(post_id=post_id).values_list('tag', flat=True)
+    )
+    if names:
+        counters.add_to_tags(names, -1)
+
+
+@transaction.atomic
+def rebuild(batch_size):
+    """Собрать индекс тегов заново по текстам постов
+    и пересчитать счётчики. Возвращает число исправленных счётчиков.
+    """
+    TagEntry.objects.all().delete()
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                'id', 'text', 'pub_date'
+            )[:batch_size]
+        )
+        if not posts:
+            break
+        last_id = posts[-1][0]
+        TagEntry.objects.bulk_create(
+            TagEntry(tag=name, post_id=post_id, pub_date=pub_date)
+            for post_id, text, pub_date in posts
+            for name in parse(text)
+        )
+    actual = dict(
+        TagEntry.objects.values_list('tag').annotate(Count('id')).order_by()
+    )
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in actual], ignore_conflicts=True
+    )
+    changed = []
+    for tag in Tag.objects.only('name', 'posts_count').iterator():
+        if tag.posts_count != actual.get(tag.name, 0):
+            tag.posts_count = actual.get(tag.name, 0)
+            changed.append(tag)
+    Tag.objects.bulk_update(changed, ['posts_count'], batch_size=batch_size)
+    return len(changed)
+
+
+class TagPaginator(CursorPaginator):
+    """Лента тега, прочитанная по индексу (tag, -pub_date, -post):
+    сначала ключи страницы из TagEntry, затем сами посты по id.
+    """
+
+    def __init__(self, name, per_page):
+        super().__init__(Post.objects.for_feed(), per_page)
+        self.name = name
+
+    def fetch(self, ordering, values, limit):
+        keys = index_keys(
+            TagEntry.objects.filter(tag=self.name),
+            ('pub_date', 'post_id'),
+            ordering, values, limit
+        )
+        posts = self.object_list.in_bulk([post_id for _, post_id in keys])
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
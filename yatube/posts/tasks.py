@@ -0,0 +1,25 @@
+from core.cache_tags import purge
+from core.tasks import task
+
+from . import caching, timeline
+from .models import Post
+
+
+@task()
+def fan_out(post_id):
+    """Разослать новый пост в ленты подписчиков."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        # Пост удалили раньше, чем до него дошла очередь.
+        return
+    followers = timeline.fan_out(post)
+    purge([caching.follow_feed(user_id) for user_id in followers])
+
+
+@task()
+def demote(author_id):
+    """Разослать посты автора, переставшего быть знаменитостью."""
+    followers = timeline.demote(author_id)
+    purge([caching.follow_feed(user_id) for user_id in followers])
@@ -0,0 +1,26 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from .. import tags
+
+register = template.Library()
+
+
+@register.filter
+def link_hashtags(text):
+    """Текст поста, в котором хештеги ведут на ленты тегов."""
+    def link(match):
+        name = match.group(1).lower()
+        if len(name) > tags.MAX_LENGTH:
+            return match.group(0)
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:tag_list', args=[name]),
+            match.group(0)
+        )
+
+    # Текст экранируется до поиска тегов, а сущности вида &#39;
+    # TAG_RE пропускает.
+    return mark_safe(tags.TAG_RE.sub(link, conditional_escape(text)))
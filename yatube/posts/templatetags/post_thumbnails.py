@@ -0,0 +1,58 @@
+from django import template
+from django.conf import settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, *aliases):
+    """Найти миниатюры для всех постов страницы одним обращением к кешу.
+
+    Ставится внутри кешируемого фрагмента, чтобы при попадании
+    в кеш не выполняться вовсе.
+    """
+    thumbnails.prefetch(posts, *aliases)
+    return ''
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """Картинка поста с адаптивными вариантами в srcset.
+
+    Миниатюры берутся из prefetch_thumbnails, если он был вызван.
+    Отсутствующие не создаются во время запроса, а ставятся в очередь:
+    пока нет основной миниатюры, показывается заглушка,
+    а ещё не созданные варианты просто не попадают в srcset.
+    """
+    if not post.image:
+        return {'post': post}
+    if not hasattr(post, 'thumbnails'):
+        thumbnails.prefetch([post])
+    found = post.thumbnails
+    if not all(found.values()):
+        thumbnails.schedule(post.image)
+    sources = {}
+    size = thumbnails.post_size(post)
+    for alias, width, format_ in thumbnails.variants(size):
+        if found.get(alias):
+            sources.setdefault(format_, []).append(
+                f'{found[alias].url} {width}w'
+            )
+    return {
+        'post': post,
+        'image': found.get('card'),
+        'sources': [
+            {'type': MIME_TYPES[format_], 'srcset': ', '.join(srcset)}
+            for format_, srcset in sources.items()
+        ],
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import capture_on_commit_callbacks
+
+from .. import autocomplete
+from ..models import Group
+
+User = get_user_model()
+
+
+class PrefixIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = autocomplete.PrefixIndex()
+        self.index.replace([
+            ('user', 1, ['leo'], 'leo'),
+            ('user', 2, ['Lena'], 'lena'),
+            ('group', 1, ['cats', 'Лёгкие кошки'], 'cats'),
+        ])
+
+    def test_lookup(self):
+        """Поиск по началу ключа без учёта регистра и «ё»"""
+        self.assertEqual(self.index.lookup('LE', 10), ['lena', 'leo'])
+        self.assertEqual(self.index.lookup('легк', 10), ['cats'])
+        self.assertEqual(self.index.lookup('ca', 10), ['cats'])
+        self.assertEqual(self.index.lookup('x', 10), [])
+        self.assertEqual(self.index.lookup(' ', 10), [])
+        self.assertEqual(self.index.lookup('le', 1), ['lena'])
+
+    def test_update_and_remove(self):
+        """Изменения применяются без перестройки индекса"""
+        self.assertTrue(self.index.update('user', 1, ['tolstoy'], 'tolstoy'))
+        self.assertFalse(
+            self.index.update('user', 1, ['tolstoy'], 'tolstoy')
+        )
+        self.assertEqual(self.index.lookup('le', 10), ['lena'])
+        self.assertEqual(self.index.lookup('to', 10), ['tolstoy'])
+        self.index.remove('group', 1)
+        self.assertEqual(self.index.lookup('ca', 10), [])
+        self.assertEqual(len(self.index), 2)
+
+
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Литература', slug='books', description='Книги'
+        )
+
+    def setUp(self):
+        # Без журнала в кеше процесс загрузит индекс из базы теста.
+        cache.clear()
+
+    def values(self, prefix):
+        return [item['value'] for item in autocomplete.lookup(prefix)]
+
+    def test_endpoint(self):
+        """Ответ содержит подсказки со ссылками и не обращается к базе"""
+        autocomplete.lookup('')
+        with self.assertNumQueries(0):
+            response = Client().get(
+                reverse('posts:autocomplete'), {'q': 'Ли'}
+            )
+        self.assertEqual(response.json(), {'results': [{
+            'type': 'group',
+            'value': 'books',
+            'label': 'Литература',
+            'url': reverse('posts:group_list', args=['books']),
+        }]})
+        response = Client().get(reverse('posts:autocomplete'), {'q': 'le'})
+        self.assertEqual(response.json()['results'][0]['label'], 'Лев Толстой')
+
+    def test_signals_update_index(self):
+        """Регистрация и изменения групп попадают в индекс
+        после фиксации транзакции"""
+        autocomplete.lookup('')
+        with capture_on_commit_callbacks(execute=True):
+            User.objects.create_user(username='lermontov')
+            self.group.title = 'Поэзия'
+            self.group.save()
+            self.assertEqual(self.values('le'), ['leo'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.values('le'), ['leo', 'lermontov'])
+            self.assertEqual(self.values('по'), ['books'])
+            self.assertEqual(self.values('ли'), [])
+        with capture_on_commit_callbacks(execute=True):
+            self.group.delete()
+        self.assertEqual(self.values('bo'), [])
+
+    def test_rollback_keeps_index(self):
+        """Откаченная регистрация не попадает в индекс"""
+        autocomplete.lookup('')
+        with capture_on_commit_callbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    User.objects.create_user(username='lermontov')
+                    raise ValueError
+        self.assertEqual(self.values('le'), ['leo'])
+
+    def test_login_keeps_journal(self):
+        """Вход пользователя не попадает в журнал изменений"""
+        autocomplete.lookup('')
+        last = cache.get(autocomplete.LAST_KEY)
+        with capture_on_commit_callbacks(execute=True):
+            Client().force_login(self.user)
+        self.assertEqual(cache.get(autocomplete.LAST_KEY), last)
+        self.assertEqual(autocomplete.index.position, last)
+
+    def test_changes_from_other_process(self):
+        """Изменение из другого процесса применяется без загрузки из базы"""
+        autocomplete.lookup('')
+        User.objects.filter(pk=self.user.pk).update(username='lev')
+        self.assertEqual(self.values('lev'), [])
+        user = User.objects.get(pk=self.user.pk)
+        change = (autocomplete.UPDATE, *autocomplete.user_item(user))
+        number = cache.incr(autocomplete.LAST_KEY)
+        cache.set(f'{autocomplete.CHANGE_PREFIX}{number}', change)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.values('le'), ['lev'])
+
+    def test_reload_when_journal_lost(self):
+        """Без журнала изменений индекс загружается из базы заново"""
+        autocomplete.lookup('')
+        User.objects.filter(pk=self.user.pk).update(username='lev')
+        cache.delete(autocomplete.LAST_KEY)
+        self.assertEqual(self.values('le'), ['lev'])
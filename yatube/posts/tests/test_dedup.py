@@ -0,0 +1,151 @@
+import datetime
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from .. import media
+from ..models import Post, StoredImage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(color=(90, 20, 160)):
+    content = io.BytesIO()
+    Image.new('RGB', (120, 80), color).save(content, 'JPEG')
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeduplicationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def create(self, content, filename='meme.jpg'):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост',
+            image=SimpleUploadedFile(filename, content, 'image/jpeg')
+        )
+
+    def refs(self, name):
+        return StoredImage.objects.get(name=name).refs
+
+    def test_same_upload_shares_file(self):
+        """Одинаковые загрузки ссылаются на один файл"""
+        first = self.create(jpeg(), 'meme.jpg')
+        digest = media.sha256(io.BytesIO(jpeg()))
+        directory = f'posts/{digest[:2]}/{digest[2:4]}'
+        self.assertRegex(first.image.name, rf'^{directory}/meme[\w]*\.jpg$')
+        files = default_storage.listdir(directory)[1]
+        second = self.create(jpeg(), 'copy.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(default_storage.listdir(directory)[1], files)
+        self.assertEqual(StoredImage.objects.count(), 1)
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_different_uploads_are_stored_separately(self):
+        """Разные картинки с одним именем хранятся отдельно"""
+        first = self.create(jpeg((255, 0, 0)))
+        second = self.create(jpeg((0, 0, 255)))
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(StoredImage.objects.count(), 2)
+
+    def test_refs_follow_edit_and_delete(self):
+        """Ссылки на файл меняются при замене картинки и удалении поста"""
+        first = self.create(jpeg())
+        second = self.create(jpeg())
+        name = first.image.name
+        second.image = SimpleUploadedFile(
+            'other.jpg', jpeg((0, 200, 0)), 'image/jpeg'
+        )
+        second.save()
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(self.refs(second.image.name), 1)
+        second.text = 'Новый текст'
+        second.save()
+        self.assertEqual(self.refs(second.image.name), 1)
+        first.delete()
+        self.assertEqual(self.refs(name), 0)
+
+    def test_upload_reuses_blob_only_if_file_exists(self):
+        """Если общий файл пропал, загрузка сохраняется заново"""
+        first = self.create(jpeg())
+        default_storage.delete(first.image.name)
+        second = self.create(jpeg())
+        self.assertTrue(default_storage.exists(second.image.name))
+        self.assertEqual(
+            StoredImage.objects.get().name, second.image.name
+        )
+
+    def test_rollback_deletes_written_file(self):
+        """Файл откаченного поста не остаётся в хранилище"""
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                name = self.create(jpeg((10, 200, 10))).image.name
+                self.assertTrue(default_storage.exists(name))
+                raise ValueError
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_deduplicate_media_merges_existing_files(self):
+        """deduplicate_media переключает посты на один файл
+        и удаляет копии
+        """
+        # Так картинки хранились до дедупликации.
+        names = [
+            default_storage.save(f'posts/{name}', ContentFile(jpeg()))
+            for name in ('a.jpg', 'b.jpg')
+        ]
+        other = default_storage.save(
+            'posts/c.jpg', ContentFile(jpeg((0, 0, 0)))
+        )
+        for name in (*names, names[1], other):
+            Post.objects.create(author=self.author, text='Пост', image=name)
+        call_command('deduplicate_media', stdout=io.StringIO())
+        images = [post.image.name for post in Post.objects.order_by('pk')]
+        self.assertEqual(images, [names[0]] * 3 + [other])
+        self.assertFalse(default_storage.exists(names[1]))
+        self.assertEqual(self.refs(names[0]), 3)
+        self.assertEqual(self.refs(other), 1)
+
+    def test_deduplicate_media_prunes_unused_files(self):
+        """deduplicate_media удаляет старые файлы без ссылок"""
+        post = self.create(jpeg())
+        name = post.image.name
+        post.delete()
+        fresh = self.create(jpeg((0, 0, 0)))
+        fresh.delete()
+        StoredImage.objects.filter(name=name).update(
+            created=timezone.now() - datetime.timedelta(days=1)
+        )
+        call_command('deduplicate_media', stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+        self.assertTrue(default_storage.exists(fresh.image.name))
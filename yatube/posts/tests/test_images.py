@@ -0,0 +1,120 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(size=(1200, 800)):
+    content = io.BytesIO()
+    Image.new('RGB', size, (30, 120, 200)).save(content, 'JPEG')
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetaTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_upload_stores_dimensions_and_placeholder(self):
+        """Размеры и превью вычисляются при загрузке картинки"""
+        content = jpeg()
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile('photo.jpg', content, 'image/jpeg'),
+        })
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        # Файл сохранён целиком, хотя превью читало его до сохранения.
+        with Image.open(post.image) as image:
+            image.load()
+            self.assertEqual(image.size, (1200, 800))
+
+    def test_rotated_jpeg_is_decoded_reduced(self):
+        """Повёрнутая по EXIF картинка декодируется уменьшенной"""
+        content = io.BytesIO()
+        exif = Image.Exif()
+        exif[images.ORIENTATION] = 6
+        Image.new('RGB', (4000, 1000)).save(content, 'JPEG', exif=exif)
+        content.seek(0)
+        with mock.patch.object(
+            ImageOps, 'exif_transpose', side_effect=ImageOps.exif_transpose
+        ) as transpose:
+            width, height, _ = images.describe(content)
+        self.assertEqual((width, height), (1000, 4000))
+        # К повороту пиксели уже читаются в уменьшенном виде.
+        self.assertLess(transpose.call_args[0][0].size[0], 4000)
+
+    def test_page_renders_placeholder_without_file_access(self):
+        """Заглушка показывает сохранённое превью"""
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост',
+            image='posts/missing.jpg',
+            image_placeholder='data:image/jpeg;base64,AAAA'
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, 'url(data:image/jpeg;base64,AAAA)')
+
+    def test_backfill_command(self):
+        """backfill_image_meta заполняет поля у старых постов"""
+        name = default_storage.save('posts/old.jpg', ContentFile(jpeg()))
+        old = Post.objects.create(
+            author=self.author,
+            text='Старый',
+            image=name
+        )
+        missing = Post.objects.create(
+            author=self.author,
+            text='Без файла',
+            image='posts/missing.jpg'
+        )
+        self.assertIsNone(old.image_width)
+        out = io.StringIO()
+        call_command('backfill_image_meta', stdout=out)
+        self.assertIn(
+            'Заполнено картинок: 1, не удалось прочитать: 1',
+            out.getvalue()
+        )
+        old.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual((old.image_width, old.image_height), (1200, 800))
+        self.assertTrue(old.image_placeholder)
+        self.assertIsNone(missing.image_width)
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=(self.group.slug,)),
+            'profile': reverse('posts:profile', args=(self.author.username,)),
+            'post': reverse('posts:post_detail', args=(self.post.pk,)),
+            'other': reverse('posts:profile', args=(self.other.username,)),
+        }
+        for url in self.urls.values():
+            self.client.get(url)
+
+    def tearDown(self):
+        cache.clear()
+
+    def stale(self):
+        """Страницы, которые после записи всё ещё берутся из кеша."""
+        cached = set()
+        for name, url in self.urls.items():
+            if self.client.get(url).context is None:
+                cached.add(name)
+        return cached
+
+    def test_cached_page_served_without_queries(self):
+        """Повторный запрос анонима не обращается к базе"""
+        for url in self.urls.values():
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.client.get(url)
+
+    def test_authenticated_user_not_cached(self):
+        """Авторизованный пользователь получает страницу без кеша"""
+        client = Client()
+        client.force_login(self.other)
+        response = client.get(self.urls['index'])
+        self.assertIsNotNone(response.context)
+
+    def test_post_write_purges_its_pages(self):
+        """Изменение поста сбрасывает только страницы с ним"""
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(self.stale(), {'other'})
+
+    def test_comment_purges_post_page(self):
+        """Комментарий сбрасывает страницы, где видно их количество"""
+        Comment.objects.create(post=self.post, author=self.other, text='Да')
+        self.assertEqual(self.stale(), {'other'})
+
+    def test_group_edit_purges_group_page(self):
+        """Изменение группы сбрасывает её страницу"""
+        self.group.description = 'Новое описание'
+        self.group.save()
+        self.assertEqual(self.stale(), {'index', 'profile', 'post', 'other'})
+
+    def test_group_delete_purges_its_pages(self):
+        """Удаление группы сбрасывает страницы со ссылкой на неё"""
+        Group.objects.get(pk=self.group.pk).delete()
+        self.assertEqual(self.stale(), {'other'})
+        self.assertEqual(self.client.get(self.urls['group']).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_matching_etag_returns_not_modified(self):
+        """Совпавший If-None-Match даёт 304 без рендеринга и запросов"""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIsNone(response.context)
+
+    def test_etag_changes_after_write(self):
+        """После комментария прежний ETag уже не подходит"""
+        etag = self.client.get(self.url)['ETag']
+        Comment.objects.create(post=self.post, author=self.author, text='Да')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_session(self):
+        """Авторизованный посетитель не получает ETag анонима"""
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
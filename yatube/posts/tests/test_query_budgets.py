@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from core.middleware import QueryCountMiddleware
+from core.testing import assert_query_budget
+from ..models import Comment, Follow, Group, Post
+from ..urls import app_name, urlpatterns
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {i} #тест',
+            )
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.reader,
+                text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(QueryBudgetTests.author)
+
+    def test_every_url_has_budget(self):
+        """У каждой страницы posts.urls объявлен бюджет запросов"""
+        for pattern in urlpatterns:
+            url_name = f'{app_name}:{pattern.name}'
+            with self.subTest(url_name=url_name):
+                self.assertIn(url_name, settings.QUERY_BUDGETS)
+
+    def test_pages_fit_query_budgets(self):
+        """Страницы укладываются в свои бюджеты запросов"""
+        post = QueryBudgetTests.post
+        requests = [
+            ('posts:index', [], None),
+            ('posts:group_list', [post.group.slug], None),
+            ('posts:profile', [post.author.username], None),
+            ('posts:post_detail', [post.id], None),
+            ('posts:post_edit', [post.id], None),
+            ('posts:post_edit', [post.id], {'text': 'Новый текст'}),
+            ('posts:post_create', [], None),
+            ('posts:post_create', [], {'text': 'Новый пост'}),
+            ('posts:add_comment', [post.id], {'text': 'Комментарий'}),
+            ('posts:follow_index', [], None),
+            ('posts:tag_list', ['тест'], None),
+            ('posts:profile_follow', ['reader'], None),
+            ('posts:profile_unfollow', ['reader'], None),
+            ('posts:search', [], {'q': 'тестовый пост'}),
+            ('posts:autocomplete', [], {'q': 'auth'}),
+        ]
+        for url_name, args, data in requests:
+            with self.subTest(url_name=url_name, method=data and 'POST'):
+                url = reverse(url_name, args=args)
+                with assert_query_budget(url_name):
+                    if data is None:
+                        self.client.get(url)
+                    elif url_name in ('posts:search', 'posts:autocomplete'):
+                        self.client.get(url, data)
+                    else:
+                        self.client.post(url, data)
+
+    def test_budget_overrun_fails(self):
+        """Превышение бюджета приводит к ошибке теста"""
+        with self.assertRaises(AssertionError):
+            with assert_query_budget('posts:index', budget=1):
+                self.client.get(reverse('posts:index'))
+
+
+class QueryCountMiddlewareTests(TestCase):
+
+    def run_middleware(self, queries, view_name='posts:index'):
+        def view(request):
+            for _ in range(queries):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT %s', [1])
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = type('Match', (), {'view_name': view_name})
+        return QueryCountMiddleware(view)(request)
+
+    def test_repeated_queries_are_logged(self):
+        """Повторяющийся запрос записывается в лог вместе с именем страницы"""
+        repeats = settings.QUERY_REPEAT_THRESHOLD
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.run_middleware(repeats)
+        self.assertTrue(
+            any('posts:index' in line and 'N+1' in line
+                for line in logs.output)
+        )
+
+    def test_budget_overrun_is_logged(self):
+        """Страница сверх бюджета записывается в лог"""
+        queries = settings.QUERY_BUDGETS['posts:index'] + 1
+        with self.settings(QUERY_REPEAT_THRESHOLD=queries + 1):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                self.run_middleware(queries)
+        self.assertIn('бюджете', logs.output[0])
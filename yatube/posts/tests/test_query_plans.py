@@ -0,0 +1,120 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# «SCAN posts_post» без индекса — полный просмотр таблицы.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_B_TREE = 'USE TEMP B-TREE'
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class QueryPlanTests(TestCase):
+    """Запросы всех страниц идут по индексам:
+    без полного просмотра таблиц и без сортировки во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {i}',
+            )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(QueryPlanTests.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, queries):
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(EXPLAINED):
+                continue
+            for step in self.explain(sql):
+                with self.subTest(sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN.match(step))
+                    self.assertNotIn(TEMP_B_TREE, step)
+
+    def get_with_next_page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            cursor = response.context['page_obj'].next_cursor
+            if cursor:
+                self.client.get(url, {'after': cursor})
+                self.client.get(url, {'before': cursor})
+        return queries
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты и их следующие страницы читаются по индексам"""
+        post = QueryPlanTests.post
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[post.group.slug]),
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_indexed(self.get_with_next_page(url))
+
+    def test_next_page_seeks_to_cursor(self):
+        """Следующая страница начинает чтение индекса сразу с курсора"""
+        post = QueryPlanTests.post
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[post.group.slug]),
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cursor = self.client.get(url).context['page_obj'].next_cursor
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url, {'after': cursor})
+                plans = [
+                    ' '.join(self.explain(query['sql']))
+                    for query in queries.captured_queries
+                    if '"pub_date" <=' in query['sql']
+                ]
+                self.assertEqual(len(plans), 1)
+                self.assertIn('pub_date<?', plans[0])
+
+    def test_post_pages_use_indexes(self):
+        """Страница поста и запросы при записи идут по индексам"""
+        post = QueryPlanTests.post
+        author = post.author.username
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:post_detail', args=[post.id]))
+            self.client.post(
+                reverse('posts:add_comment', args=[post.id]),
+                {'text': 'Комментарий'}
+            )
+            self.client.post(reverse('posts:post_create'), {'text': 'Пост'})
+            self.client.get(reverse('posts:profile_unfollow', args=[author]))
+            self.client.get(reverse('posts:profile_follow', args=[author]))
+        self.assert_indexed(queries)
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Мои кошки любят рыбу и кошек соседа'
+        )
+        cls.dog = Post.objects.create(author=cls.author, text='Про собаку')
+        cls.comment = Comment.objects.create(
+            author=cls.author, post=cls.dog, text='А у меня кошка'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        return list(
+            search.search_posts(Post.objects.all(), query).order_by(
+                'rank', '-pk'
+            ).values_list('pk', flat=True)
+        )
+
+    def test_stem(self):
+        """Окончания отбрасываются, короткие и нерусские слова не меняются"""
+        self.assertEqual(search.stem('Кошками'), 'кошк')
+        self.assertEqual(search.stem('ёжики'), 'ежик')
+        self.assertEqual(search.stem('кот'), 'кот')
+        self.assertEqual(search.stem('Django'), 'django')
+
+    def test_inflected_forms(self):
+        """Запрос находит другие формы слова"""
+        self.assertEqual(self.found('кошками'), [self.cats.pk, self.dog.pk])
+        self.assertEqual(self.found('собаки'), [self.dog.pk])
+
+    def test_all_words_required(self):
+        """Находятся только посты со всеми словами запроса"""
+        self.assertEqual(self.found('кошки рыба'), [self.cats.pk])
+        self.assertEqual(self.found('кошки слон'), [])
+
+    def test_query_operators_ignored(self):
+        """Синтаксис FTS5 в запросе не ломает поиск"""
+        self.assertEqual(self.found('"кошки*'), self.found('кошки'))
+        # OR — обычное слово, а не оператор.
+        self.assertEqual(self.found('кошки OR собаки'), [])
+        self.assertEqual(self.found('  '), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении, даже через update()"""
+        Post.objects.filter(pk=self.cats.pk).update(text='Про слона')
+        self.assertEqual(self.found('слон'), [self.cats.pk])
+        self.assertEqual(self.found('рыба'), [])
+        self.comment.delete()
+        self.assertEqual(self.found('кошка'), [])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_search_page(self):
+        """Страница поиска листается, сохраняя запрос"""
+        url = reverse('posts:search')
+        response = Client().get(url, {'q': 'кошка'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), [self.cats])
+        self.assertContains(
+            response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0&amp;after='
+        )
+        response = Client().get(
+            url, {'q': 'кошка', 'after': page_obj.next_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.dog])
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по индексу"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошками'}
+        )
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.cats.pk, self.dog.pk}
+        )
+        response = client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'кошками'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.comment]
+        )
@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from core.single_flight import LOCK_PREFIX, get_or_compute
+
+THREADS = 8
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        cache.clear()
+
+    def compute(self):
+        with self.lock:
+            self.calls += 1
+        # Остальные потоки успевают прийти, пока фрагмент рендерится.
+        time.sleep(0.2)
+        return 'фрагмент'
+
+    def test_parallel_renders_compute_once(self):
+        """Параллельные промахи рендерят фрагмент один раз"""
+        template = Template(
+            '{% load coalesced_cache %}'
+            '{% coalesced_cache 60 feed key %}{{ compute }}'
+            '{% endcoalesced_cache %}'
+        )
+        barrier = threading.Barrier(THREADS)
+
+        def render(_):
+            barrier.wait()
+            return template.render(
+                Context({'compute': self.compute, 'key': 'index'})
+            )
+
+        with ThreadPoolExecutor(THREADS) as executor:
+            results = list(executor.map(render, range(THREADS)))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['фрагмент'] * THREADS)
+
+    def test_stale_value_served_while_recomputing(self):
+        """Пока значение пересчитывается, остальным отдаётся старое"""
+        cache.set('key', ('старое', time.time() - 1, 0.1), 60)
+        cache.add(LOCK_PREFIX + 'key', 1)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'старое')
+        self.assertEqual(self.calls, 0)
+
+    def test_early_refresh(self):
+        """Долго считающееся значение обновляется до истечения срока"""
+        cache.set('key', ('старое', time.time() + 1, 10 ** 6), 60)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'фрагмент')
+        fresh = ('свежее', time.time() + 60, 0.0)
+        cache.set('key', fresh, 60)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'свежее')
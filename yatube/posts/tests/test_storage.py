@@ -0,0 +1,78 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg():
+    content = io.BytesIO()
+    Image.new('RGB', (1200, 800), (90, 20, 160)).save(content, 'JPEG')
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShardedStorageTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_upload_goes_to_shard(self):
+        """Загрузка попадает в подкаталоги с сохранением имени файла"""
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост',
+            image=SimpleUploadedFile('photo.jpg', jpeg(), 'image/jpeg')
+        )
+        self.assertRegex(
+            post.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/photo\.jpg$'
+        )
+
+    def test_shard_media_moves_flat_files(self):
+        """shard_media переносит файлы и переписывает пути постов"""
+        # Так файлы лежали до появления подкаталогов.
+        flat = FileSystemStorage().save('posts/old.jpg', ContentFile(jpeg()))
+        post = Post.objects.create(author=self.author, text='Пост', image=flat)
+        thumbnails.generate(flat)
+        old_thumbnail = thumbnails.lookup(flat, 'card')
+        out = io.StringIO()
+        call_command('shard_media', stdout=out)
+        self.assertIn('перенесено файлов: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertRegex(
+            post.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/old\.jpg$'
+        )
+        self.assertTrue(default_storage.exists(post.image.name))
+        self.assertFalse(default_storage.exists(flat))
+        self.assertFalse(default_storage.exists(old_thumbnail.name))
+        self.assertIsNotNone(thumbnails.lookup(post.image, 'card'))
+        out = io.StringIO()
+        call_command('shard_media', stdout=out)
+        self.assertIn('перенесено файлов: 0', out.getvalue())
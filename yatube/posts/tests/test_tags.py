@@ -0,0 +1,113 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import tags
+from ..models import Post, Tag, TagEntry
+
+User = get_user_model()
+
+
+class TagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'posts_count'))
+
+    def entries(self, post):
+        return set(
+            TagEntry.objects.filter(post=post).values_list('tag', flat=True)
+        )
+
+    def test_parse(self):
+        """Теги без повторов, в нижнем регистре, не из середины слова"""
+        self.assertEqual(
+            tags.parse('#Кошки и #кошки, #dogs_2! a#b &#39; #'),
+            ['кошки', 'dogs_2']
+        )
+        self.assertEqual(tags.parse('#' + 'a' * (tags.MAX_LENGTH + 1)), [])
+
+    def test_counts_follow_posts(self):
+        """Индекс и счётчики обновляются при создании, правке и удалении"""
+        first = Post.objects.create(author=self.author, text='#кот #пёс')
+        second = Post.objects.create(author=self.author, text='#кот')
+        self.assertEqual(self.counts(), {'кот': 2, 'пёс': 1})
+        self.assertEqual(self.entries(first), {'кот', 'пёс'})
+        first.text = '#пёс #мышь'
+        first.save()
+        self.assertEqual(self.counts(), {'кот': 1, 'пёс': 1, 'мышь': 1})
+        self.assertEqual(self.entries(first), {'пёс', 'мышь'})
+        second.delete()
+        self.assertEqual(self.counts(), {'кот': 0, 'пёс': 1, 'мышь': 1})
+
+    def test_unchanged_tags_not_written(self):
+        """Правка без изменения тегов не пишет в индекс"""
+        post = Post.objects.create(author=self.author, text='#кот')
+        post.text = 'Снова #кот'
+        with self.assertNumQueries(0):
+            tags.sync(post, '#кот')
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_tag_page(self):
+        """Лента тега листается по индексу"""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i} #кот')
+            for i in range(3)
+        ]
+        Post.objects.create(author=self.author, text='Без тега')
+        url = reverse('posts:tag_list', args=['Кот'])
+        response = Client().get(url)
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), posts[:0:-1])
+        self.assertEqual(response.context['tag'].posts_count, 3)
+        response = Client().get(url, {'after': page_obj.next_cursor})
+        self.assertEqual(list(response.context['page_obj']), posts[:1])
+        self.assertEqual(
+            Client().get(reverse('posts:tag_list', args=['нет'])).status_code,
+            404
+        )
+
+    def test_tag_pages_cached_separately(self):
+        """Ленты разных тегов не делят закешированный фрагмент"""
+        Post.objects.create(author=self.author, text='Про #кот')
+        Post.objects.create(author=self.author, text='Про #пёс')
+        self.assertContains(
+            Client().get(reverse('posts:tag_list', args=['кот'])), 'Про'
+        )
+        response = Client().get(reverse('posts:tag_list', args=['пёс']))
+        self.assertContains(response, 'пёс</a>')
+        self.assertNotContains(response, 'кот</a>')
+
+    def test_tags_linked(self):
+        """Хештеги в тексте поста ведут на ленту тега"""
+        post = Post.objects.create(
+            author=self.author, text='<b>#Кот</b>'
+        )
+        response = Client().get(post.get_absolute_url())
+        self.assertContains(
+            response,
+            f'&lt;b&gt;<a href="{reverse("posts:tag_list", args=["кот"])}">'
+            '#Кот</a>&lt;/b&gt;',
+            html=False
+        )
+
+    def test_rebuild_tags(self):
+        """rebuild_tags восстанавливает индекс и счётчики"""
+        post = Post.objects.create(author=self.author, text='#кот')
+        Post.objects.filter(pk=post.pk).update(text='#пёс')
+        Tag.objects.update(posts_count=7)
+        out = io.StringIO()
+        call_command('rebuild_tags', stdout=out)
+        self.assertEqual(self.counts(), {'кот': 0, 'пёс': 1})
+        self.assertEqual(self.entries(post), {'пёс'})
+        self.assertIn('Исправлено счётчиков тегов: 2', out.getvalue())
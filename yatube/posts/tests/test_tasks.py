@@ -0,0 +1,160 @@
+import datetime
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task(max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=2)
+def fail(value):
+    raise ValueError(value)
+
+
+@override_settings(TASKS_EAGER=False, TASKS_IN_PROCESS=False)
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+        cache.clear()
+
+    def test_enqueue_and_run(self):
+        """Задача ждёт в очереди и выполняется исполнителем"""
+        tasks.enqueue(record, 'a')
+        self.assertEqual(Task.objects.get().status, Task.PENDING)
+        self.assertEqual(calls, [])
+        self.assertEqual(tasks.run_due(), 1)
+        self.assertEqual(calls, ['a'])
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.DONE, 1))
+
+    def test_idempotency_key(self):
+        """Задача с тем же ключом ставится один раз"""
+        tasks.enqueue(record, 'a', key='record:a')
+        tasks.enqueue(record, 'a', key='record:a')
+        tasks.run_due()
+        tasks.enqueue(record, 'a', key='record:a')
+        tasks.run_due()
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_failed_keyed_task_can_be_enqueued_again(self):
+        """Неудачная или давно выполненная задача с ключом ставится снова"""
+        tasks.enqueue(fail, 'a', key='task:a')
+        Task.objects.update(max_attempts=1)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_due()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        tasks.enqueue(record, 'a', key='task:a')
+        self.assertEqual(tasks.run_due(), 1)
+        self.assertEqual(calls, ['a'])
+        Task.objects.update(
+            finished=timezone.now() - datetime.timedelta(days=2)
+        )
+        tasks.enqueue(record, 'b', key='task:a')
+        tasks.run_due()
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется позже, затем помечается неудачной"""
+        tasks.enqueue(fail, 'boom')
+        before = timezone.now()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_due()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertIn('ValueError: boom', task.last_error)
+        self.assertGreaterEqual(
+            task.run_at, before + datetime.timedelta(seconds=10)
+        )
+        self.assertEqual(tasks.run_due(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_due()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(tasks.retry_delay(3), 40)
+
+    def test_stale_running_task_reclaimed(self):
+        """Задачу упавшего исполнителя забирает другой"""
+        tasks.enqueue(record, 'a')
+        claimed = tasks.claim(1)
+        self.assertEqual(tasks.claim(1), [])
+        Task.objects.update(
+            locked_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(
+            [task.pk for task in tasks.claim(1)],
+            [task.pk for task in claimed]
+        )
+
+    def test_purge_finished(self):
+        """Старые выполненные задачи удаляются"""
+        tasks.enqueue(record, 'a')
+        tasks.enqueue(fail, 'b')
+        Task.objects.update(max_attempts=1)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_due()
+        Task.objects.update(
+            finished=timezone.now() - datetime.timedelta(days=2)
+        )
+        self.assertEqual(tasks.purge_finished(), 1)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_run_tasks_command(self):
+        """run_tasks --once выполняет очередь и выходит"""
+        for value in 'abc':
+            tasks.enqueue(record, value)
+        out = io.StringIO()
+        call_command('run_tasks', '--once', '--workers', '0', stdout=out)
+        self.assertEqual(sorted(calls), ['a', 'b', 'c'])
+        self.assertIn('Выполнено задач: 3', out.getvalue())
+
+    def test_fan_out_goes_through_queue(self):
+        """Новый пост попадает в ленты подписчиков через очередь"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        tasks.run_due()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(reader.pk, post.pk)]
+        )
+
+    def test_requires_task_decorator(self):
+        """Ставить в очередь можно только объявленные задачи"""
+        with self.assertRaises(TypeError):
+            tasks.enqueue(print, 'a')
+
+
+class EagerTaskTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_eager_runs_immediately(self):
+        """В тестах задача выполняется сразу и не попадает в очередь"""
+        tasks.enqueue(record, 'a')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.enqueue(fail, 'b')
+        self.assertEqual(calls, ['a'])
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,339 @@
+import io
+import itertools
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Task
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Одинаковые картинки хранятся одним файлом (posts.media),
+# поэтому каждая тестовая картинка помечена своей точкой.
+MARKS = itertools.count()
+
+
+def make_image(name='photo.jpg', size=(1200, 800)):
+    content = io.BytesIO()
+    image = Image.new('RGB', size, (200, 50, 50))
+    image.putpixel((next(MARKS) * 8 % size[0], 0), (0, 0, 0))
+    image.save(content, 'JPEG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=make_image()
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_generate_creates_configured_thumbnails(self):
+        """generate создаёт миниатюры, которые затем находит lookup"""
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+        thumbnails.generate(self.post.image)
+        thumbnail = thumbnails.lookup(self.post.image, 'card')
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+    @override_settings(TASKS_EAGER=False)
+    def test_page_shows_placeholder_without_generating(self):
+        """Страница не создаёт миниатюру сама, а ставит её в очередь
+        и показывает заглушку
+        """
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+        self.assertTrue(
+            Task.objects.filter(key=f'thumbnails:{self.post.image}').exists()
+        )
+
+    @override_settings(TASKS_EAGER=False)
+    def test_schedule_once_per_image(self):
+        """Повторная постановка той же картинки в очередь игнорируется"""
+        thumbnails.schedule(self.post.image)
+        cache.clear()
+        thumbnails.schedule(self.post.image)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_task_generates_thumbnails(self):
+        """Задача создаёт миниатюры, а пропавший файл пропускает"""
+        thumbnails.generate_for_posts(self.post.image.name)
+        self.assertIsNotNone(thumbnails.lookup(self.post.image, 'card'))
+        thumbnails.generate_for_posts('posts/missing.jpg')
+        self.assertIsNone(thumbnails.lookup('posts/missing.jpg', 'card'))
+
+    def test_post_create_schedules_thumbnails(self):
+        """Создание поста с картинкой ставит миниатюры в очередь"""
+        client = Client()
+        client.force_login(self.author)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            client.post(
+                reverse('posts:post_create'),
+                {'text': 'Новый пост', 'image': make_image('new.jpg')}
+            )
+        schedule.assert_called_once()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPrefetchTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for number in range(3):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f'Пост {number}',
+                image=make_image(f'photo{number}.jpg')
+            )
+            thumbnails.generate(post.image)
+        Post.objects.create(author=cls.author, text='Пост без картинки')
+        cls.pending = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой без миниатюры',
+            image=make_image('pending.jpg')
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_prefetch_uses_one_query_then_cache(self):
+        """Миниатюры страницы читаются одним запросом, затем из кеша"""
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts, 'card')
+        again = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(again, 'card')
+        for post in posts:
+            with self.subTest(post=post.text):
+                if not post.image:
+                    self.assertFalse(hasattr(post, 'thumbnails'))
+                elif post == self.pending:
+                    self.assertIsNone(post.thumbnails['card'])
+                else:
+                    self.assertEqual(
+                        post.thumbnails['card'].name,
+                        thumbnails.lookup(post.image, 'card').name
+                    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RegenerateThumbnailsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f'Пост {number}',
+                image=make_image(f'big{number}.jpg', size=(4000, 3000))
+            )
+            for number in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def regenerate(self, *args):
+        out = io.StringIO()
+        call_command(
+            'regenerate_thumbnails', '--workers', '0', *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_creates_missing_and_skips_up_to_date(self):
+        """Команда создаёт недостающие миниатюры и пропускает готовые"""
+        self.assertIn('создано миниатюр: 3', self.regenerate('--alias=card'))
+        for post in self.posts:
+            thumbnail = thumbnails.lookup(post.image, 'card')
+            self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        self.assertIn('создано миниатюр: 0', self.regenerate('--alias=card'))
+        self.assertIn(
+            'создано миниатюр: 3',
+            self.regenerate('--alias=card', '--force')
+        )
+
+    def test_resumes_from_start_id(self):
+        """--start-id пропускает уже обработанные посты"""
+        output = self.regenerate(
+            '--alias=card', '--start-id', str(self.posts[0].pk)
+        )
+        self.assertIn('создано миниатюр: 2', output)
+        self.assertIsNone(thumbnails.lookup(self.posts[0].image, 'card'))
+
+    def test_shared_image_regenerated_once(self):
+        """Картинка нескольких постов обрабатывается один раз"""
+        content = make_image().read()
+        shared = [
+            Post.objects.create(
+                author=self.author,
+                text=f'Пост с общей картинкой {number}',
+                image=SimpleUploadedFile('shared.jpg', content, 'image/jpeg')
+            )
+            for number in range(2)
+        ]
+        self.assertEqual(shared[0].image.name, shared[1].image.name)
+        for args in ((), ('--force',)):
+            with self.subTest(args=args), mock.patch.object(
+                thumbnails, 'regenerate', return_value=0
+            ) as regenerate:
+                self.regenerate('--alias=card', *args)
+            names = [call[0][0] for call in regenerate.call_args_list]
+            self.assertEqual(names.count(shared[0].image.name), 1)
+
+    def test_jpeg_decoded_reduced(self):
+        """Большой JPEG декодируется сразу в уменьшенном виде"""
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост с большой картинкой',
+            image=make_image('huge.jpg', size=(4000, 3000))
+        )
+        decoded = []
+        original = Image.Image.convert
+
+        def convert(image, *args, **kwargs):
+            # colorspace декодирует картинку первым.
+            decoded.append(image.size)
+            return original(image, *args, **kwargs)
+
+        with mock.patch.object(
+            Image.Image, 'convert', autospec=True, side_effect=convert
+        ):
+            thumbnails.regenerate(post.image.name, ['card'])
+        width, _ = decoded[0]
+        self.assertLess(width, 4000)
+        self.assertGreaterEqual(width, 960 * 2)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_VARIANTS={480: 20 * 1024, 960: 110 * 1024},
+    POST_IMAGE_FORMATS=('AVIF', 'JPEG'),
+)
+class ResponsiveVariantsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        noise = Image.effect_noise((1200, 800), 64).convert('RGB')
+        content = io.BytesIO()
+        noise.save(content, 'JPEG', quality=95)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с шумной картинкой',
+            image=SimpleUploadedFile('noise.jpg', content.getvalue())
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_only_supported_formats(self):
+        """Варианты создаются только в форматах, доступных Pillow"""
+        self.assertEqual(
+            [alias for alias, _, _ in thumbnails.variants()],
+            ['card-480-jpeg', 'card-960-jpeg']
+        )
+
+    def test_variants_fit_byte_budget(self):
+        """Качество вариантов подбирается под предельный размер файла"""
+        thumbnails.generate(self.post.image)
+        for alias, width, _ in thumbnails.variants():
+            with self.subTest(alias=alias):
+                thumbnail = thumbnails.lookup(self.post.image, alias)
+                self.assertEqual(thumbnail.width, width)
+                self.assertLessEqual(
+                    thumbnail.storage.size(thumbnail.name),
+                    settings.POST_IMAGE_VARIANTS[width]
+                )
+
+    def test_page_lists_variants_in_srcset(self):
+        """Карточка перечисляет варианты в srcset и грузится лениво"""
+        thumbnails.generate(self.post.image)
+        response = Client().get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        variants = [
+            thumbnails.lookup(self.post.image, alias).url + f' {width}w'
+            for alias, width, _ in thumbnails.variants()
+        ]
+        self.assertContains(response, f'srcset="{", ".join(variants)}"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_variants_larger_than_source_are_skipped(self):
+        """Варианты шире картинки не создаются и не попадают в srcset"""
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост с маленькой картинкой',
+            image=make_image('small.jpg', size=(600, 400))
+        )
+        thumbnails.generate(post.image)
+        self.assertIsNotNone(thumbnails.lookup(post.image, 'card-480-jpeg'))
+        self.assertIsNone(thumbnails.lookup(post.image, 'card-960-jpeg'))
+        response = Client().get(reverse('posts:post_detail', args=(post.pk,)))
+        small = thumbnails.lookup(post.image, 'card-480-jpeg')
+        self.assertContains(response, f'srcset="{small.url} 480w"')
+        self.assertFalse(Task.objects.filter(
+            key=f'thumbnails:{post.image.name}'
+        ).exists())
@@ -0,0 +1,70 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.cache_backends import TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = TieredCache('', {
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_MAX_BYTES': 1024,
+                'L1_TIMEOUT': 5,
+            },
+        })
+        self.shared = caches['shared']
+        self.cache.clear()
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_get_falls_through_to_shared_cache(self):
+        """Промах L1 читает L2 и запоминает значение в L1"""
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats()['l1'], {'hits': 1, 'misses': 1})
+        self.assertEqual(self.cache.stats()['l2'], {'hits': 1, 'misses': 0})
+
+    def test_get_many_reads_only_missing_keys_from_shared_cache(self):
+        """get_many обращается к L2 только за ключами, которых нет в L1"""
+        self.cache.set('a', 1)
+        self.shared.set('b', 2)
+        found = self.cache.get_many(['a', 'b', 'c'])
+        self.assertEqual(found, {'a': 1, 'b': 2})
+        self.assertEqual(self.cache.stats()['l1'], {'hits': 1, 'misses': 2})
+        self.assertEqual(self.cache.stats()['l2'], {'hits': 1, 'misses': 1})
+
+    def test_l1_copy_expires(self):
+        """Копия в L1 живёт не дольше L1_TIMEOUT"""
+        self.cache.set('key', 'old')
+        self.shared.set('key', 'new')
+        self.assertEqual(self.cache.get('key'), 'old')
+        later = time.monotonic() + 6
+        with mock.patch('core.cache_backends.time.monotonic') as monotonic:
+            monotonic.return_value = later
+            self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_l1_bounded_by_bytes(self):
+        """L1 вытесняет давно не читанные ключи при превышении размера"""
+        for number in range(10):
+            self.cache.set(f'key{number}', 'x' * 200)
+        stats = self.cache.stats()
+        self.assertLessEqual(stats['l1_bytes'], 1024)
+        self.assertLess(stats['l1_keys'], 10)
+        self.assertEqual(self.cache.get('key9'), 'x' * 200)
+        self.shared.clear()
+        self.assertIsNone(self.cache.get('key0'))
+
+    def test_incr_goes_to_shared_cache(self):
+        """Счётчики общие для процессов и не залипают в L1"""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.shared.get('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
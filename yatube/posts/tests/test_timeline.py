@@ -0,0 +1,140 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import get_counters
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import METRICS
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+
+    def timeline_posts(self, user):
+        return [
+            entry.post for entry in
+            TimelineEntry.objects.filter(user=user).order_by('-pub_date')
+        ]
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline_posts(self.reader), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            self.timeline_posts(self.reader),
+            [post, self.old_post]
+        )
+        self.assertEqual(self.timeline_posts(self.stranger), [])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertEqual(self.timeline_posts(self.reader), [])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты по подпискам"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        TimelineEntry.objects.create(
+            user=self.stranger,
+            post=self.old_post,
+            pub_date=self.old_post.pub_date
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(self.reader), [self.old_post])
+        self.assertEqual(self.timeline_posts(self.stranger), [])
+
+
+@override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+class HybridTimelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.fan, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_celebrity_posts_are_not_pushed(self):
+        """Посты знаменитости не рассылаются по лентам"""
+        Post.objects.create(author=self.celebrity, text='Для всех')
+        Post.objects.create(author=self.author, text='Для подписчиков')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.celebrity).exists()
+        )
+        self.assertEqual(
+            get_counters(METRICS),
+            {
+                'timeline.push.writes': 1,
+                'timeline.push.reads': 0,
+                'timeline.pull.posts': 1,
+                'timeline.pull.reads': 0,
+            }
+        )
+
+    def test_demoted_author_posts_stay_in_feed(self):
+        """Посты бывшей знаменитости остаются в лентах подписчиков"""
+        post = Post.objects.create(author=self.celebrity, text='Для всех')
+        Follow.objects.filter(user=self.fan, author=self.celebrity).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post
+        ).exists())
+        newer = Post.objects.create(author=self.celebrity, text='Ещё')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [newer, post])
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента сливает разосланные посты и посты знаменитостей по дате"""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate(
+                [self.celebrity, self.author] * settings.POSTS_PER_PAGE
+            )
+        ]
+        posts.reverse()
+        url = reverse('posts:follow_index')
+        response = self.client.get(url)
+        first_page = response.context['page_obj']
+        response = self.client.get(url, {'after': first_page.next_cursor})
+        self.assertEqual(
+            list(first_page) + list(response.context['page_obj']),
+            posts
+        )
+        counters = get_counters(METRICS)
+        self.assertGreater(counters['timeline.push.reads'], 0)
+        self.assertGreater(counters['timeline.pull.reads'], 0)
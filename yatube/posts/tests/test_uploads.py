@@ -0,0 +1,147 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import uploads
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
+
+def image_bytes(size=(300, 200), format_='JPEG', **options):
+    content = io.BytesIO()
+    image = Image.new('RGB', size, (120, 60, 30))
+    image.putpixel((0, 0), (255, 255, 255))
+    image.save(content, format_, **options)
+    return content.getvalue()
+
+
+def exif_bytes(orientation):
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif[MAKE] = 'Камера'
+    return exif.tobytes()
+
+
+class ImageUploadHandlerTests(TestCase):
+
+    def receive(self, content, chunk_size):
+        handler = uploads.ImageUploadHandler()
+        handler.new_file('image', 'photo.png', 'image/png', len(content))
+        passed = []
+        for start in range(0, len(content), chunk_size):
+            chunk = handler.receive_data_chunk(
+                content[start:start + chunk_size], start
+            )
+            if chunk is None:
+                break
+            passed.append(chunk)
+        return b''.join(passed), handler.file_complete(len(content))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_rejects_by_header(self):
+        """Картинка с лишними пикселями отклоняется по первому куску"""
+        passed, upload = self.receive(
+            image_bytes((200, 200), 'PNG'), chunk_size=64
+        )
+        self.assertEqual(passed, b'')
+        self.assertIn('Картинка слишком большая', upload.upload_error)
+        self.assertEqual(upload.size, 0)
+
+    def test_passes_allowed_image(self):
+        """Допустимая картинка передаётся дальше целиком"""
+        content = image_bytes((200, 200), 'PNG')
+        passed, upload = self.receive(content, chunk_size=16)
+        self.assertEqual(passed, content)
+        self.assertIsNone(upload)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_rejects_by_bytes(self):
+        """Слишком большой файл отклоняется, как только превысил лимит"""
+        passed, upload = self.receive(image_bytes(), chunk_size=64)
+        self.assertEqual(len(passed), 64)
+        self.assertIn('Файл слишком большой', upload.upload_error)
+
+    def test_passes_non_image(self):
+        """Файл без заголовка картинки оставляется форме"""
+        content = b'x' * 1000
+        passed, upload = self.receive(content, chunk_size=100)
+        self.assertEqual(passed, content)
+        self.assertIsNone(upload)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadNormalizationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def upload(self, content, name='photo.jpg'):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    def test_exif_stripped_and_orientation_applied(self):
+        """EXIF удаляется, а ориентация из него применяется к пикселям"""
+        self.upload(image_bytes(exif=exif_bytes(orientation=6)))
+        post = Post.objects.get()
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (200, 300))
+            self.assertEqual(dict(image.getexif()), {})
+        self.assertEqual((post.image_width, post.image_height), (200, 300))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=150)
+    def test_large_image_downscaled(self):
+        """Картинка уменьшается до POST_IMAGE_MAX_SIDE"""
+        self.upload(image_bytes())
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (150, 100))
+        self.assertEqual(post.image.name.rsplit('/', 1)[-1], 'photo.jpg')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_rejected(self):
+        """Форма показывает ошибку для слишком большой картинки"""
+        response = self.upload(image_bytes((200, 200), 'PNG'), 'photo.png')
+        self.assertFalse(Post.objects.exists())
+        self.assertIn(
+            'Картинка слишком большая',
+            response.context['form'].errors['image'][0]
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_large_file_rejected(self):
+        """Форма показывает ошибку для слишком большого файла"""
+        response = self.upload(image_bytes())
+        self.assertFalse(Post.objects.exists())
+        self.assertIn(
+            'Файл слишком большой',
+            response.context['form'].errors['image'][0]
+        )
@@ -4,13 +4,14 @@ import tempfile
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from ..models import Follow, Post, Group
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -163,6 +164,68 @@ class ViewTests(TestCase):
                         field = form.fields[field_name]
                         self.assertIsInstance(field, field_type)
 
+    def test_cursor_pagination(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу"""
+        url = reverse('posts:profile', args=[ViewTests.user.username])
+        response = self.client.get(url)
+        first_page = response.context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        response = self.client.get(url, {'after': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual(
+            list(second_page),
+            ViewTests.posts[settings.POSTS_PER_PAGE:]
+        )
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(second_page.has_next())
+        response = self.client.get(
+            url,
+            {'before': second_page.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), list(first_page))
+
+    @override_settings(POSTS_PER_PAGE=4)
+    def test_cursor_pagination_back_from_deep_page(self):
+        """Со страницы глубже второй курсор before ведёт на страницу,
+        у которой есть и предыдущая, и следующая"""
+        url = reverse('posts:profile', args=[ViewTests.user.username])
+        page = self.client.get(url).context['page_obj']
+        for _ in range(2):
+            page = self.client.get(
+                url, {'after': page.next_cursor}
+            ).context['page_obj']
+        self.assertEqual(list(page), ViewTests.posts[8:12])
+        page = self.client.get(
+            url, {'before': page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(page), ViewTests.posts[4:8])
+        self.assertTrue(page.has_previous())
+        self.assertTrue(page.has_next())
+        self.assertIsNotNone(page.next_cursor)
+
+    def test_cursor_pagination_ignores_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу"""
+        url = reverse('posts:profile', args=[ViewTests.user.username])
+        for cursor in ('abc', 'W10', '!!!'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'after': cursor})
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    ViewTests.posts[:settings.POSTS_PER_PAGE]
+                )
+
+    def test_cursor_pagination_does_not_count(self):
+        """Глубокая страница не использует COUNT и OFFSET"""
+        url = reverse('posts:follow_index')
+        response = self.client_follower.get(url)
+        cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.client_follower.get(url, {'after': cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
     def test_post_detail_page_have_image(self):
         """На странице поста есть его картинка"""
         response = self.client.get(
@@ -199,25 +262,65 @@ class ViewTests(TestCase):
         # Если этот тест упадёт, при использовании assertEqual
         # будет очень много вывода.
         # Поэтому используется assertTrue и assertFalse.
+        # Первый показ создаёт миниатюры (в тестах задачи выполняются
+        # сразу), и это сбрасывает ленту.
+        cache.clear()
+        self.client.get(reverse('posts:index'))
         cache.clear()
         response = self.client.get(reverse('posts:index'))
         # Кеш был очищен, выполненный после очистки запрос сгенерировал новый
         initial_content = response.content
-        # Этот пост точно отображается на странице,
-        # его удаление должно привести к изменению страницы
-        # после истечения срока хранения кеша.
+        # Изменение в обход модели не меняет версию ленты,
+        # поэтому страница собирается из кеша.
         post = Post.objects.all()[0]
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Изменено в обход кеша')
         response = self.client.get(reverse('posts:index'))
-        # Так как посты кешируются, данные не должны отличаться
         self.assertTrue(response.content == initial_content)
-        cache.delete(make_template_fragment_key('index_page'))
+        # Удаление поста меняет версию ленты,
+        # и кеш со старыми постами больше не используется.
+        post.delete()
         response = self.client.get(reverse('posts:index'))
-        # Теперь данные должны отличаться от изначальных,
-        # Потому что пост был изменён,
-        # И кеш, содержащий старые посты, удалён.
         self.assertFalse(response.content == initial_content)
 
+    def test_feed_cache_depends_on_page(self):
+        """Каждая страница ленты кешируется отдельно"""
+        cache.clear()
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        first_page = response.content
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'after': cursor})
+        self.assertFalse(response.content == first_page)
+        self.assertContains(response, ViewTests.posts[-1].text)
+
+    def test_feed_cache_invalidated_by_writes(self):
+        """Новый пост и комментарий сразу видны в закешированных лентах"""
+        cache.clear()
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[ViewTests.group2.slug]),
+            reverse('posts:profile', args=[ViewTests.user.username]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        self.client_follower.get(reverse('posts:follow_index'))
+        post = Post.objects.create(
+            author=ViewTests.user,
+            group=ViewTests.group2,
+            text='Свежий пост'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+        response = self.client_follower.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Свежий пост')
+        self.client.post(
+            reverse('posts:add_comment', args=[post.id]),
+            {'text': 'Комментарий'}
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 1')
+
     def test_authorized_user_can_follow_other_user(self):
         """Авторизованный пользователь может подписываться
         На других пользователей."""
@@ -288,3 +391,77 @@ class ViewTests(TestCase):
         self.assertIn(new_post, response.context['page_obj'])
         response = self.clients[1].get(reverse('posts:follow_index'))
         self.assertNotIn(new_post, response.context['page_obj'])
+
+
+class FeedQueriesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}')
+            for i in range(settings.POSTS_PER_PAGE)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        self.client.force_login(FeedQueriesTests.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_pages_use_constant_number_of_queries(self):
+        """Число запросов на странице не зависит от числа постов,
+        авторов и комментариев на ней"""
+        authors = FeedQueriesTests.authors
+        group = FeedQueriesTests.group
+        post = Post.objects.create(author=authors[0], group=group, text='1')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[authors[0].username]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=[post.id]),
+        ]
+        expected = {url: self.count_queries(url) for url in urls}
+        for author in authors[1:] + authors[:1] * settings.POSTS_PER_PAGE:
+            Post.objects.create(author=author, group=group, text='Пост')
+            Comment.objects.create(post=post, author=author, text='Текст')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), expected[url])
+
+    def test_cached_fragment_skips_feed_queries(self):
+        """При попадании в кеш фрагмента посты ленты не выбираются"""
+        authors = FeedQueriesTests.authors
+        group = FeedQueriesTests.group
+        Post.objects.create(author=authors[0], group=group, text='#тег')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[authors[0].username]),
+            reverse('posts:follow_index'),
+            reverse('posts:tag_list', args=['тег']),
+        ]
+        cache.clear()
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, '#тег')
+                for query in queries.captured_queries:
+                    for table in ('posts_post', 'posts_timelineentry',
+                                  'posts_tagentry'):
+                        self.assertNotIn(f'"{table}"', query['sql'])
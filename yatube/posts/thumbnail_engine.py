@@ -0,0 +1,104 @@
+import logging
+import math
+
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.engines.pil_engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Во сколько раз промежуточная картинка должна быть больше итоговой,
+# чтобы грубое уменьшение не испортило качество (как в Image.thumbnail).
+REDUCING_GAP = 2
+# Ниже этого качества ради размера файла не опускаемся.
+MIN_QUALITY = 30
+
+
+class ReducingEngine(Engine):
+    """PIL-движок sorl-thumbnail, уменьшающий картинку ещё при чтении.
+
+    JPEG сразу декодируется в уменьшенном в 2–8 раз виде (Image.draft),
+    остальные форматы перед масштабированием сжимаются в целое число раз
+    (Image.reduce), и лишь затем выполняется точное масштабирование
+    с ANTIALIAS.
+
+    Опция max_bytes задаёт предельный размер файла: качество
+    подбирается наибольшим, при котором миниатюра в него укладывается.
+    """
+
+    def write(self, image, options, thumbnail):
+        if options.get('max_bytes'):
+            options = dict(options, quality=self._fit_quality(image, options))
+        super().write(image, options, thumbnail)
+
+    def _fit_quality(self, image, options):
+        low, high = MIN_QUALITY, options['quality']
+        best, fitted = low, False
+        while low <= high:
+            quality = (low + high) // 2
+            data = self._get_raw_data(
+                image,
+                options['format'],
+                quality,
+                image_info=options.get('image_info', {}),
+                progressive=options.get(
+                    'progressive', settings.THUMBNAIL_PROGRESSIVE
+                )
+            )
+            if len(data) <= options['max_bytes']:
+                best, fitted, low = quality, True, quality + 1
+            else:
+                high = quality - 1
+        if not fitted:
+            logger.warning(
+                'Миниатюра %sx%s не укладывается в %s байт',
+                *image.size, options['max_bytes']
+            )
+        return best
+
+    def create(self, image, geometry, options):
+        # Image.draft действует только до декодирования, а create
+        # декодирует картинку уже в colorspace, задолго до scale.
+        if not options['cropbox'] and not options.get('remove_border'):
+            self._draft(image, geometry, options)
+        return super().create(image, geometry, options)
+
+    def _draft(self, image, geometry, options):
+        x_image, y_image = map(float, self.get_image_size(image))
+        orientation = options.get(
+            'orientation', settings.THUMBNAIL_ORIENTATION
+        )
+        if orientation and self._flip_dimensions(image):
+            x_image, y_image = y_image, x_image
+        # Из той же картинки sorl потом строит и версии @2x и т. п.
+        resolution = max([1, *settings.THUMBNAIL_ALTERNATIVE_RESOLUTIONS])
+        factor = self._calculate_scaling_factor(
+            x_image, y_image, geometry, options
+        ) * resolution * REDUCING_GAP
+        if factor < 1:
+            width, height = self.get_image_size(image)
+            image.draft(
+                None, (math.ceil(width * factor), math.ceil(height * factor))
+            )
+
+    def scale(self, image, geometry, options):
+        x_image, y_image = map(float, self.get_image_size(image))
+        if self.flip_dimensions(image):
+            x_image, y_image = y_image, x_image
+        factor = self._calculate_scaling_factor(
+            x_image, y_image, geometry, options
+        )
+        if factor * REDUCING_GAP < 1:
+            image = self._reduce(image, factor * REDUCING_GAP)
+        return super().scale(image, geometry, options)
+
+    def _reduce(self, image, factor):
+        width, height = image.size
+        target = (math.ceil(width * factor), math.ceil(height * factor))
+        times = min(image.size[0] // target[0], image.size[1] // target[1])
+        if times < 2:
+            return image
+        try:
+            return image.reduce(times)
+        except ValueError:
+            # Режим картинки не поддерживается Image.reduce.
+            return image
@@ -0,0 +1,221 @@
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core import metrics
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .utils import CursorPaginator, get_cursor_page, index_keys
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+
+METRICS = (
+    'timeline.push.writes',
+    'timeline.push.reads',
+    'timeline.pull.posts',
+    'timeline.pull.reads',
+)
+
+
+def get_celebrity_ids():
+    """Авторы, чьи посты не рассылаются подписчикам,
+    а подмешиваются в ленту при чтении.
+    """
+    celebrity_ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if celebrity_ids is None:
+        celebrity_ids = frozenset(
+            UserCounters.objects.filter(
+                followers_count__gte=settings.TIMELINE_CELEBRITY_FOLLOWERS
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(
+            CELEBRITIES_CACHE_KEY,
+            celebrity_ids,
+            settings.TIMELINE_CELEBRITIES_TIMEOUT
+        )
+    return celebrity_ids
+
+
+def followed_celebrity_ids(user_id):
+    celebrity_ids = get_celebrity_ids()
+    if not celebrity_ids:
+        return []
+    return list(
+        Follow.objects.filter(
+            user_id=user_id,
+            author_id__in=celebrity_ids
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Разослать новый пост в ленты всех подписчиков автора.
+
+    Возвращает id подписчиков, в чьи ленты попал пост.
+    """
+    if post.author_id in get_celebrity_ids():
+        metrics.incr('timeline.pull.posts')
+        return []
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    entries = (
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers
+    )
+    _bulk_insert(entries)
+    return followers
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту подписчика уже опубликованные посты автора."""
+    if author_id in get_celebrity_ids():
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    entries = (
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+    _bulk_insert(entries)
+
+
+def push_author(author_id, since=None):
+    """Разослать подписчикам уже опубликованные посты автора
+    (с since — только начиная с этой даты).
+
+    Возвращает id подписчиков, в чьи ленты попали посты.
+    """
+    followers = list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True))
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    entries = (
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.values_list(
+            'id', 'pub_date'
+        ).iterator()
+        for user_id in followers
+    )
+    _bulk_insert(entries)
+    return followers
+
+
+def demote(author_id):
+    """Перевести автора, у которого стало меньше
+    TIMELINE_CELEBRITY_FOLLOWERS подписчиков, на рассылку.
+
+    Его посты, опубликованные, пока он был знаменитостью, ни в одной
+    ленте не лежат, поэтому сначала они рассылаются, и только потом
+    автор пропадает из кеша знаменитостей: иначе ленты на время
+    рассылки лишились бы его постов. Посты, вышедшие между рассылкой
+    и сбросом кеша, ещё не были разосланы — их досылаем вторым проходом.
+
+    Возвращает id подписчиков, чьи ленты изменились.
+    """
+    followers_count = UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first()
+    if (
+        followers_count is None
+        or followers_count >= settings.TIMELINE_CELEBRITY_FOLLOWERS
+    ):
+        return []
+    started = timezone.now()
+    followers = push_author(author_id)
+    cache.delete(CELEBRITIES_CACHE_KEY)
+    push_author(author_id, since=started)
+    return followers
+
+
+def prune(user_id, author_id):
+    """Убрать из ленты бывшего подписчика посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Собрать ленту пользователя заново по Follow и Post."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(
+        author_id__in=get_celebrity_ids()
+    ).values_list('id', 'pub_date')
+    entries = (
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+    _bulk_insert(entries)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: разосланные посты, слитые при чтении
+    с постами «знаменитостей» в порядке (pub_date, pk).
+
+    Каждый источник отдаёт не больше limit ключей после курсора,
+    поэтому слияние обходится в k * limit строк при k источниках.
+    """
+
+    def __init__(self, user_id, per_page):
+        super().__init__(Post.objects.for_feed(), per_page)
+        self.user_id = user_id
+
+    def fetch(self, ordering, values, limit):
+        pushed = index_keys(
+            TimelineEntry.objects.filter(user_id=self.user_id),
+            ('pub_date', 'post_id'),
+            ordering, values, limit
+        )
+        metrics.incr('timeline.push.reads', len(pushed))
+        sources = [pushed]
+        for author_id in followed_celebrity_ids(self.user_id):
+            pulled = index_keys(
+                Post.objects.filter(author_id=author_id),
+                ('pub_date', 'id'),
+                ordering, values, limit
+            )
+            metrics.incr('timeline.pull.reads', len(pulled))
+            sources.append(pulled)
+        keys = []
+        seen = set()
+        merged = heapq.merge(*sources, reverse=ordering[0].startswith('-'))
+        for key in merged:
+            # Пост мог попасть в ленту до того, как автор стал знаменитостью.
+            if key[1] not in seen:
+                seen.add(key[1])
+                keys.append(key)
+            if len(keys) == limit:
+                break
+        posts = self.object_list.in_bulk([post_id for _, post_id in keys])
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+
+def get_timeline_page(request, user):
+    paginator = TimelinePaginator(user.pk, settings.POSTS_PER_PAGE)
+    return get_cursor_page(request, paginator)
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _insert_batch(batch)
+            batch = []
+    if batch:
+        _insert_batch(batch)
+
+
+def _insert_batch(batch):
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    metrics.incr('timeline.push.writes', len(batch))
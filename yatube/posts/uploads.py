@@ -0,0 +1,146 @@
+import io
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Форматы, которые могут нести EXIF (в том числе геометку):
+# такие картинки пересохраняются без метаданных.
+EXIF_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP')
+SAVE_FORMATS = {'MPO': 'JPEG'}
+
+
+class RejectedUpload(UploadedFile):
+    """Пустой файл на месте отклонённой при загрузке картинки.
+
+    Данные картинки не сохраняются ни в памяти, ни на диске,
+    а форма показывает upload_error.
+    """
+
+    def __init__(self, name, content_type, charset, upload_error):
+        super().__init__(io.BytesIO(), name, content_type, 0, charset)
+        self.upload_error = upload_error
+
+
+def image_size(data):
+    """Размеры картинки по её началу или None, если заголовок
+    ещё не пришёл целиком (или это не картинка).
+
+    Image.open читает только заголовок, пиксели не декодируются.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        # Pillow отказывается открывать такие картинки вовсе,
+        # поэтому точных размеров не узнать.
+        return Image.MAX_IMAGE_PIXELS * 2 + 1, 1
+    except (OSError, ValueError):
+        return None
+
+
+def size_error(width, height):
+    """Сообщение об ошибке, если картинка слишком велика для декодирования."""
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        return (
+            'Картинка слишком большая: допускается не больше '
+            f'{settings.POST_IMAGE_MAX_PIXELS / 10 ** 6:g} мегапикселей.'
+        )
+    return None
+
+
+def bytes_error():
+    return (
+        'Файл слишком большой: допускается не больше '
+        f'{filesizeformat(settings.POST_IMAGE_MAX_BYTES)}.'
+    )
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Проверяет загружаемый файл по мере поступления данных.
+
+    Как только пришёл заголовок картинки, её размеры сверяются
+    с POST_IMAGE_MAX_PIXELS, а весь файл — с POST_IMAGE_MAX_BYTES.
+    Данные отклонённого файла дальше по цепочке обработчиков
+    не передаются, вместо него форма получает RejectedUpload.
+    Файлы, в начале которых заголовок картинки не нашёлся,
+    пропускаются как есть: их отклонит форма.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b''
+        self.header_checked = False
+        self.upload_error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.upload_error:
+            return None
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_BYTES:
+            self.upload_error = bytes_error()
+            return None
+        if not self.header_checked:
+            self.check_header(raw_data)
+            if self.upload_error:
+                return None
+        return raw_data
+
+    def check_header(self, raw_data):
+        self.header += raw_data
+        size = image_size(self.header)
+        if size is not None:
+            self.upload_error = size_error(*size)
+        if size is not None or (
+            len(self.header) >= settings.POST_IMAGE_HEADER_BYTES
+        ):
+            self.header_checked = True
+            self.header = b''
+
+    def file_complete(self, file_size):
+        if self.upload_error:
+            return RejectedUpload(
+                self.file_name,
+                self.content_type,
+                self.charset,
+                self.upload_error
+            )
+        return None
+
+
+def normalize(upload):
+    """Пересохранить картинку без EXIF, повернув её по EXIF-ориентации
+    и уменьшив до POST_IMAGE_MAX_SIDE по большей стороне.
+
+    JPEG сразу декодируется в уменьшенном виде (draft), поэтому
+    памяти нужно не больше, чем на картинку чуть больше итоговой;
+    остальные форматы ограничены POST_IMAGE_MAX_PIXELS.
+    Анимации и форматы без EXIF возвращаются без изменений.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if (
+            image.format not in EXIF_FORMATS
+            or image.format not in Image.SAVE
+            or getattr(image, 'is_animated', False)
+        ):
+            upload.seek(0)
+            return upload
+        format_ = SAVE_FORMATS.get(image.format, image.format)
+        icc_profile = image.info.get('icc_profile')
+        bound = (settings.POST_IMAGE_MAX_SIDE,) * 2
+        image.draft(image.mode, bound)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(bound, Image.LANCZOS, reducing_gap=3.0)
+        output = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        options = {'exif': b'', 'icc_profile': icc_profile}
+        if format_ == 'JPEG':
+            options['quality'] = settings.POST_IMAGE_QUALITY
+        image.save(output, format_, **options)
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(output, upload.name, Image.MIME[format_], size)
@@ -1,8 +1,210 @@
+import base64
+import binascii
+import datetime
+import json
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder обрезает время до миллисекунд,
+        # а курсору нужно точное значение ключа.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def keyset_filter(ordering, values):
+    """(a, b, c) «после» (x, y, z) для сортировки по убыванию:
+    a <= x AND (a < x OR (a = x AND b < y) OR (a = x AND b = y AND c < z)).
+
+    Условие a <= x избыточно, но без него SQLite не может
+    начать чтение индекса с курсора и просматривает его с начала.
+    """
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def index_keys(queryset, names, ordering, values, limit):
+    """Первые limit ключей names из queryset строго после values.
+
+    Для лент, хранящихся в отдельной таблице-индексе: ordering
+    задан по полям поста, а names — соответствующие поля индекса.
+    """
+    source_ordering = tuple(
+        f'-{name}' if order.startswith('-') else name
+        for order, name in zip(ordering, names)
+    )
+    queryset = queryset.order_by(*source_ordering)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(source_ordering, values))
+    return list(queryset.values_list(*names)[:limit])
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        name[1:] if name.startswith('-') else f'-{name}'
+        for name in ordering
+    )
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки (keyset) вместо LIMIT/OFFSET.
+
+    Страница выбирается условием «строго после/до курсора» по полям
+    ordering, поэтому её стоимость не зависит от глубины,
+    а COUNT(*) не выполняется вовсе.
+    Последнее поле ordering должно быть уникальным (обычно pk).
+
+    Номера страниц курсорам не нужны, поэтому Page.number здесь —
+    лишь признак: 1 для первой страницы и 2 для любой следующей,
+    а num_pages на единицу больше номера, если дальше есть страница.
+    Этого достаточно, чтобы has_next/has_previous у обычного Page
+    работали без подсчёта объектов.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = tuple(ordering)
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    def validate_number(self, number):
+        return number
+
+    def encode_cursor(self, obj):
+        values = [self.key_value(obj, name) for name in self.ordering]
+        data = json.dumps(values, cls=CursorEncoder).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def key_value(self, obj, name):
+        """Значение поля сортировки name у объекта страницы."""
+        return getattr(obj, self._attname(name))
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(data.decode())
+        except (ValueError, binascii.Error) as error:
+            raise InvalidCursor(cursor) from error
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        try:
+            return [
+                self._to_python(name, value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except ValidationError as error:
+            raise InvalidCursor(cursor) from error
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        name = name.lstrip('-')
+        try:
+            return opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотация (например, ранг поиска).
+            return None
+
+    def _attname(self, name):
+        field = self._field(name)
+        return field.attname if field else name.lstrip('-')
+
+    def _to_python(self, name, value):
+        field = self._field(name)
+        return field.to_python(value) if field else value
+
+    def fetch(self, ordering, values, limit):
+        """Первые limit объектов в порядке ordering строго после values."""
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(ordering, values))
+        return list(queryset[:limit])
+
+    def cursor_page(self, after=None, before=None):
+        """Страница после курсора after, до курсора before
+        или первая страница, если курсор не указан или испорчен.
+        """
+        backwards = before is not None and after is None
+        try:
+            values = self.decode_cursor(before if backwards else after)
+        except (InvalidCursor, TypeError):
+            values, backwards = None, False
+        ordering = self.ordering
+        if backwards:
+            ordering = reverse_ordering(ordering)
+        objects = self.fetch(ordering, values, self.per_page + 1)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if backwards and not has_more:
+            # Дошли до начала ленты: отдаём полную первую страницу.
+            return self.cursor_page()
+        if backwards:
+            objects.reverse()
+            has_previous, self._has_next = True, True
+        else:
+            has_previous, self._has_next = values is not None, has_more
+        self._number = 2 if has_previous else 1
+        page = Page(objects, self._number, self)
+        page.previous_cursor = (
+            self.encode_cursor(objects[0])
+            if has_previous and objects else None
+        )
+        page.next_cursor = (
+            self.encode_cursor(objects[-1])
+            if self._has_next and objects else None
+        )
+        return page
+
+
+def lazy_page(get_page):
+    """Page, поля которого берутся из get_page() при первом обращении
+    к любому из них.
+
+    Это по-прежнему обычный Page, но если фрагмент ленты, где он
+    выводится, взят из кеша, посты не выбираются вовсе.
+    """
+    page = SimpleLazyObject(get_page)
+
+    def field(name):
+        return SimpleLazyObject(lambda: getattr(page, name))
+
+    lazy = Page(field('object_list'), field('number'), field('paginator'))
+    lazy.previous_cursor = field('previous_cursor')
+    lazy.next_cursor = field('next_cursor')
+    return lazy
+
+
+def get_cursor_page(request, paginator):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    return lazy_page(
+        lambda: paginator.cursor_page(after=after, before=before)
+    )
 
 
-def get_page_obj(request, posts):
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def get_page_obj(request, posts, ordering=('-pub_date', '-pk')):
+    paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE, ordering)
+    return get_cursor_page(request, paginator)
@@ -1,40 +1,93 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.urls import reverse
+
+from core.page_cache import cache_page_for_anonymous, conditional_page
+
+from . import autocomplete, thumbnails
+from .caching import (
+    INDEX,
+    get_feed_cache_context,
+    get_follow_feed_cache_context,
+    group_feed,
+    group_page_tags,
+    index_page_tags,
+    post_page_tags,
+    profile_feed,
+    profile_page_tags,
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
-from .utils import get_page_obj
+from .models import Follow, Group, Post, Tag
+from .search import search_posts
+from .tags import TagPaginator
+from .timeline import get_timeline_page
+from .utils import get_cursor_page, get_page_obj
 
 
 User = get_user_model()
 
 
+@conditional_page(index_page_tags)
+@cache_page_for_anonymous(index_page_tags)
 def index(request):
-    posts = Post.objects.select_related('group').all()
+    # Версии кеша читаются до выборки постов, иначе запись между ними
+    # сохранит устаревший фрагмент под новой версией.
+    feed_cache = get_feed_cache_context(request, INDEX)
+    posts = Post.objects.for_feed()
     page_obj = get_page_obj(request, posts)
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
         'index': True,
+        **feed_cache,
     }
     return render(request, template, context)
 
 
+@conditional_page(group_page_tags)
+@cache_page_for_anonymous(group_page_tags)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    feed_cache = get_feed_cache_context(request, group_feed(group.pk))
+    posts = group.posts.for_feed()
     page_obj = get_page_obj(request, posts)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    # Пост в ленте тега есть и в общей ленте, а её версия меняется
+    # при любом изменении постов; тег различает фрагменты в шаблоне.
+    feed_cache = get_feed_cache_context(request, INDEX)
+    paginator = TagPaginator(tag.name, settings.POSTS_PER_PAGE)
+    context = {
+        'tag': tag,
+        'page_obj': get_cursor_page(request, paginator),
+        **feed_cache,
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
+@conditional_page(profile_page_tags)
+@cache_page_for_anonymous(profile_page_tags)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    page_obj = get_page_obj(request, user.posts.all())
+    user = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    feed_cache = get_feed_cache_context(request, profile_feed(user.pk))
+    page_obj = get_page_obj(request, user.posts.for_feed())
     following = False
     if request.user.is_authenticated:
         following = request.user.follower.filter(author=user).exists()
@@ -42,20 +95,50 @@ def profile(request, username):
         'author': user,
         'page_obj': page_obj,
         'following': following,
+        **feed_cache,
     }
     return render(request, 'posts/profile.html', context=context)
 
 
+@conditional_page(post_page_tags)
+@cache_page_for_anonymous(post_page_tags)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__counters'),
+        pk=post_id
+    )
     context = {
         'post': post,
         'form': CommentForm(),
-        'comments': post.comments.all(),
+        'comments': post.comments.select_related('author'),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def suggest(request):
+    """Подсказки пользователей и групп по началу имени для поля поиска."""
+    results = []
+    for item in autocomplete.lookup(request.GET.get('q', '')):
+        url = reverse(
+            autocomplete.URL_NAMES[item['type']], args=[item['value']]
+        )
+        results.append({**item, 'url': url})
+    return JsonResponse({'results': results})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(Post.objects.for_feed(), query)
+    page_obj = get_page_obj(request, posts, ordering=('rank', '-pk'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # Ссылки пагинатора сохраняют запрос.
+        'page_query': urlencode({'q': query}),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -64,14 +147,16 @@ def post_create(request):
         return render(request, 'posts/create_post.html', context)
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    with transaction.atomic():
+        post.save()
+        thumbnails.schedule(post.image)
     return redirect(request.user)
 
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
+    if post.author_id != request.user.pk:
         return redirect(post)
     form = PostForm(
         request.POST or None,
@@ -82,28 +167,32 @@ def post_edit(request, post_id):
         context = {'is_edit': True, 'form': form, 'post': post}
         return render(request, 'posts/create_post.html', context)
     form.save()
+    if 'image' in form.changed_data:
+        thumbnails.schedule(post.image)
     return redirect(post)
 
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect(post)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_obj(request, posts)
+    feed_cache = get_follow_feed_cache_context(request, request.user)
+    page_obj = get_timeline_page(request, request.user)
     context = {
         'page_obj': page_obj,
         'follow': True,
+        **feed_cache,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -112,7 +201,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:  # Пользователь не пытается подписаться на себя.
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect(author)
 
 
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -153,16 +155,124 @@ STATICFILES_DIRS = [
 ]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки раскладываются по подкаталогам: posts/3f/a2/photo.jpg.
+DEFAULT_FILE_STORAGE = 'core.storage.ShardedFileSystemStorage'
+MEDIA_SHARD_DEPTH = 2
+
+# Миниатюры картинок постов: имя -> (геометрия, опции sorl-thumbnail).
+# Создаются в фоне после загрузки картинки, а не при первом показе.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Адаптивные варианты карточки: ширина -> предельный размер файла.
+# Они создаются в каждом формате из POST_IMAGE_FORMATS, который умеет
+# сохранять установленный Pillow, и перечисляются в srcset.
+POST_IMAGE_VARIANTS = {
+    480: 30 * 1024,
+    960: 80 * 1024,
+    1440: 160 * 1024,
+}
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(min-width: 1200px) 960px, 100vw'
+# Ограничения загружаемых картинок (posts.uploads): размер файла
+# и число пикселей проверяются по мере загрузки, по заголовку картинки.
+# Принятые картинки пересохраняются без EXIF и не больше
+# POST_IMAGE_MAX_SIDE по большей стороне.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_HEADER_BYTES = 256 * 1024
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_QUALITY = 90
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+THUMBNAIL_ENGINE = 'posts.thumbnail_engine.ReducingEngine'
+POST_THUMBNAIL_PENDING_TIMEOUT = 60 * 10
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
-
-
+# Сколько подсказок отдаёт /autocomplete/.
+AUTOCOMPLETE_LIMIT = 10
+
+# Очередь задач в базе (core.tasks). Задачи выполняет run_tasks;
+# с TASKS_IN_PROCESS веб-процесс сам запускает их в фоновых потоках
+# сразу после фиксации транзакции, а run_tasks подбирает остальное.
+# С TASKS_EAGER задача выполняется сразу при постановке (в тестах).
+TASKS_EAGER = False
+TASKS_IN_PROCESS = True
+# Без TASKS_THREADED веб-процесс выполняет задачи в том же потоке сразу
+# после фиксации: например, в SQLite в памяти с общим кешем второй поток
+# писать не может.
+TASKS_THREADED = True
+TASKS_WORKERS = 2
+TASKS_MAX_ATTEMPTS = 5
+# Повтор через TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд.
+TASKS_RETRY_DELAY = 10
+TASKS_MAX_RETRY_DELAY = 60 * 60
+TASKS_LOCK_TIMEOUT = 60 * 10
+TASKS_RETENTION = 60 * 60 * 24
+
+TIMELINE_BATCH_SIZE = 1000
+# Посты авторов, у которых подписчиков не меньше этого числа,
+# не рассылаются по лентам, а подмешиваются при чтении.
+TIMELINE_CELEBRITY_FOLLOWERS = 1000
+TIMELINE_CELEBRITIES_TIMEOUT = 300
+
+
+# Задачи очереди в тестах выполняются сразу (core.testing.TestRunner).
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Сколько SQL-запросов допускается на страницу (по имени URL).
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:post_edit': 10,
+    'posts:post_create': 9,
+    'posts:add_comment': 8,
+    'posts:follow_index': 5,
+    'posts:profile_follow': 12,
+    'posts:profile_unfollow': 9,
+    'posts:search': 3,
+    'posts:tag_list': 5,
+    'posts:autocomplete': 2,
+    'api:v1:index': 3,
+    'api:v1:group_list': 4,
+    'api:v1:profile': 4,
+    'api:v1:post_detail': 4,
+}
+# Сколько раз один и тот же запрос может повториться за запрос к сайту,
+# прежде чем это будет записано в лог как N+1.
+QUERY_REPEAT_THRESHOLD = 5
+
+# Фрагменты лент сбрасываются сменой версии при записи,
+# поэтому их можно хранить долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# Страницы для анонимов сбрасываются по тегам; таймаут ограничивает
+# устаревание того, что тегами не отслеживается (счётчики автора поста).
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Частые ключи (версии тегов, список знаменитостей) читаются из памяти
+# процесса, остальное — из общего для всех процессов кеша 'shared'.
+# В разработке его заменяет LocMemCache, на сервере — Memcached
+# или FileBasedCache на общем диске.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_BYTES': 8 * 1024 * 1024,
+            'L1_TIMEOUT': 5,
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    },
 }
@@ -0,0 +1,14 @@
+"""Настройки для тестов pytest (см. pytest.ini)."""
+
+import atexit
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+# Тестовая база pytest — SQLite в памяти: фоновые потоки очереди задач
+# не могут в неё писать.
+TASKS_THREADED = False
+# Загрузки тестов не должны попадать в media/ проекта.
+MEDIA_ROOT = tempfile.mkdtemp(prefix='yatube-media-')
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Индекс подсказок строится при старте процесса, а не на первом запросе.
+from posts import autocomplete  # noqa: E402
+
+autocomplete.load()